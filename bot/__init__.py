@@ -1,17 +1,13 @@
 import faulthandler
 import logging
 import os
-import random
 import socket
-import string
 import threading
 import time
 import requests
 import aria2p
 import telegram.ext as tg
 from dotenv import load_dotenv
-from pyrogram import Client
-from telegraph import Telegraph
 
 faulthandler.enable()
 import subprocess
@@ -19,6 +15,8 @@ import subprocess
 from megasdkrestclient import MegaSdkRestClient
 from megasdkrestclient import errors as mega_err
 
+from bot.helper.mirror_utils.upload_utils.leech_client import LeechClient
+
 socket.setdefaulttimeout(600)
 
 botStartTime = time.time()
@@ -86,6 +84,18 @@ try:
         RECURSIVE_SEARCH = False
 except KeyError:
     RECURSIVE_SEARCH = False
+try:
+    SEARCH_INDEX = getConfig("SEARCH_INDEX")
+    SEARCH_INDEX = SEARCH_INDEX.lower() == "true"
+except KeyError:
+    SEARCH_INDEX = False
+try:
+    SEARCH_INDEX_INTERVAL = getConfig("SEARCH_INDEX_INTERVAL")
+    if len(SEARCH_INDEX_INTERVAL) == 0:
+        raise KeyError
+    SEARCH_INDEX_INTERVAL = max(int(SEARCH_INDEX_INTERVAL), 10)
+except KeyError:
+    SEARCH_INDEX_INTERVAL = 300
                 
 
 if RECURSIVE_SEARCH:
@@ -183,18 +193,10 @@ if DB_URI is not None:
         conn.close()    
 
 LOGGER.info("Generating USER_SESSION_STRING")
-app = Client(
+app = LeechClient(
     ":memory:", api_id=int(TELEGRAM_API), api_hash=TELEGRAM_HASH, bot_token=BOT_TOKEN
 )
 
-# Generate Telegraph Token
-sname = "".join(random.SystemRandom().choices(string.ascii_letters, k=8))
-LOGGER.info("Generating Telegraph Token using '" + sname + "' name")
-telegraph = Telegraph()
-telegraph.create_account(short_name=sname)
-telegraph_token = telegraph.get_access_token()
-LOGGER.info("Telegraph Token Generated: '" + telegraph_token + "'")
-
 try:
     MEGA_KEY = getConfig("MEGA_KEY")
 
@@ -274,6 +276,48 @@ try:
         USE_SERVICE_ACCOUNTS = False
 except KeyError:
     USE_SERVICE_ACCOUNTS = False
+try:
+    SERVICE_ACCOUNT_COOLDOWN = getConfig("SERVICE_ACCOUNT_COOLDOWN")
+    if len(SERVICE_ACCOUNT_COOLDOWN) == 0:
+        raise KeyError
+    SERVICE_ACCOUNT_COOLDOWN = int(SERVICE_ACCOUNT_COOLDOWN)
+except KeyError:
+    SERVICE_ACCOUNT_COOLDOWN = 86400
+try:
+    METADATA_CACHE_SIZE = getConfig("METADATA_CACHE_SIZE")
+    if len(METADATA_CACHE_SIZE) == 0:
+        raise KeyError
+    METADATA_CACHE_SIZE = int(METADATA_CACHE_SIZE)
+except KeyError:
+    METADATA_CACHE_SIZE = 10000
+try:
+    METADATA_CACHE_TTL = getConfig("METADATA_CACHE_TTL")
+    if len(METADATA_CACHE_TTL) == 0:
+        raise KeyError
+    METADATA_CACHE_TTL = int(METADATA_CACHE_TTL)
+except KeyError:
+    METADATA_CACHE_TTL = 300
+try:
+    HTTP_POOL_SIZE = getConfig("HTTP_POOL_SIZE")
+    if len(HTTP_POOL_SIZE) == 0:
+        raise KeyError
+    HTTP_POOL_SIZE = max(int(HTTP_POOL_SIZE), 1)
+except KeyError:
+    HTTP_POOL_SIZE = 20
+try:
+    DRIVE_API_RATE = getConfig("DRIVE_API_RATE")
+    if len(DRIVE_API_RATE) == 0:
+        raise KeyError
+    DRIVE_API_RATE = max(float(DRIVE_API_RATE), 0)
+except KeyError:
+    DRIVE_API_RATE = 10
+try:
+    DRIVE_BATCH_RATE = getConfig("DRIVE_BATCH_RATE")
+    if len(DRIVE_BATCH_RATE) == 0:
+        raise KeyError
+    DRIVE_BATCH_RATE = max(float(DRIVE_BATCH_RATE), 0)
+except KeyError:
+    DRIVE_BATCH_RATE = 150
 
 try:
     BLOCK_MEGA_LINKS = getConfig("BLOCK_MEGA_LINKS")
@@ -310,6 +354,41 @@ try:
     AS_DOCUMENT = AS_DOCUMENT.lower() == 'true'
 except KeyError:
     AS_DOCUMENT = False
+try:
+    UPLOAD_WORKERS = getConfig('UPLOAD_WORKERS')
+    if len(UPLOAD_WORKERS) == 0:
+        raise KeyError
+    UPLOAD_WORKERS = max(int(UPLOAD_WORKERS), 1)
+except KeyError:
+    UPLOAD_WORKERS = 1
+try:
+    LEECH_WORKERS = getConfig('LEECH_WORKERS')
+    if len(LEECH_WORKERS) == 0:
+        raise KeyError
+    LEECH_WORKERS = max(int(LEECH_WORKERS), 1)
+except KeyError:
+    LEECH_WORKERS = 1
+try:
+    CLONE_WORKERS = getConfig('CLONE_WORKERS')
+    if len(CLONE_WORKERS) == 0:
+        raise KeyError
+    CLONE_WORKERS = max(int(CLONE_WORKERS), 1)
+except KeyError:
+    CLONE_WORKERS = 1
+try:
+    DOWNLOAD_CONNECTIONS = getConfig('DOWNLOAD_CONNECTIONS')
+    if len(DOWNLOAD_CONNECTIONS) == 0:
+        raise KeyError
+    DOWNLOAD_CONNECTIONS = max(int(DOWNLOAD_CONNECTIONS), 1)
+except KeyError:
+    DOWNLOAD_CONNECTIONS = 1
+try:
+    DOWNLOAD_WORKERS = getConfig('DOWNLOAD_WORKERS')
+    if len(DOWNLOAD_WORKERS) == 0:
+        raise KeyError
+    DOWNLOAD_WORKERS = max(int(DOWNLOAD_WORKERS), 1)
+except KeyError:
+    DOWNLOAD_WORKERS = 1
 
 #VIEW_LINK
 try:
@@ -336,6 +415,35 @@ try:
         STOP_DUPLICATE_CLONE = False
 except KeyError:
     STOP_DUPLICATE_CLONE = False
+try:
+    CONTENT_INDEX = getConfig('CONTENT_INDEX')
+    CONTENT_INDEX = CONTENT_INDEX.lower() == 'true'
+except KeyError:
+    CONTENT_INDEX = False
+try:
+    CONTENT_INDEX_INTERVAL = getConfig('CONTENT_INDEX_INTERVAL')
+    if len(CONTENT_INDEX_INTERVAL) == 0:
+        raise KeyError
+    CONTENT_INDEX_INTERVAL = max(int(CONTENT_INDEX_INTERVAL), 10)
+except KeyError:
+    CONTENT_INDEX_INTERVAL = 300
+try:
+    SKIP_DUPLICATE_UPLOADS = getConfig('SKIP_DUPLICATE_UPLOADS')
+    SKIP_DUPLICATE_UPLOADS = SKIP_DUPLICATE_UPLOADS.lower() == 'true'
+except KeyError:
+    SKIP_DUPLICATE_UPLOADS = False
+try:
+    STREAM_MIRROR = getConfig('STREAM_MIRROR')
+    STREAM_MIRROR = STREAM_MIRROR.lower() == 'true'
+except KeyError:
+    STREAM_MIRROR = False
+try:
+    STREAM_BUFFER_SIZE = getConfig('STREAM_BUFFER_SIZE')
+    if len(STREAM_BUFFER_SIZE) == 0:
+        raise KeyError
+    STREAM_BUFFER_SIZE = max(int(STREAM_BUFFER_SIZE), 1) * 1024 * 1024
+except KeyError:
+    STREAM_BUFFER_SIZE = 64 * 1024 * 1024
 #HEROKUSUPPORT    
 try:
     TOKEN_PICKLE_URL = getConfig('TOKEN_PICKLE_URL')
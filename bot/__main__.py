@@ -7,9 +7,11 @@ from sys import executable
 import psutil
 from telegram import InlineKeyboardMarkup
 from telegram.ext import CommandHandler
-from bot import IGNORE_PENDING_REQUESTS, app, bot, botStartTime, dispatcher, updater
+from bot import CONTENT_INDEX, IGNORE_PENDING_REQUESTS, RECURSIVE_SEARCH, SEARCH_INDEX, app, bot, botStartTime, dispatcher, updater
 from bot.helper.ext_utils import fs_utils
 from bot.helper.ext_utils.bot_utils import get_readable_file_size, get_readable_time
+from bot.helper.ext_utils.http_transport import transport_stats
+from bot.helper.mirror_utils.upload_utils.gdriveTools import GoogleDriveHelper, drive_scheduler, metadata_cache
 from bot.helper.telegram_helper.bot_commands import BotCommands
 from bot.helper.telegram_helper import button_build
 from bot.helper.telegram_helper.filters import CustomFilters
@@ -57,6 +59,19 @@ def stats(update, context):
         f"<b>RAM:</b> {memory}% "
         f"<b>Disk:</b> {disk}%"
     )
+    cache_stats = metadata_cache.stats()
+    if cache_stats:
+        stats += "\n\n<b>Drive cache hits:</b> " + " ".join(
+            f"{kind} {rate}% ({hits}/{hits + misses})"
+            for kind, (hits, misses, rate) in sorted(cache_stats.items())
+        )
+    connection_stats = transport_stats.stats()
+    if connection_stats:
+        stats += "\n\n<b>Connections reused:</b> " + " ".join(
+            f"{transport} {round(reused / sent * 100)}% ({reused}/{sent})"
+            for transport, (sent, reused) in sorted(connection_stats.items())
+        )
+    stats += f"\n<b>Drive API calls waiting:</b> {drive_scheduler.queue_depth()}"
     sendMessage(stats, context.bot, update)
 
 def start(update, context):
@@ -156,7 +171,7 @@ botcmds = [
     (f"{BotCommands.TarMirrorCommand}", "Start mirroring and upload as .tar"),
     (f"{BotCommands.UnzipMirrorCommand}", "Extract files"),
     (f"{BotCommands.CloneCommand}", "Copy file/folder from GDrive"),
-    (f"{BotCommands.deleteCommand}", "Delete file from GDrive [owner only]"),
+    (f"{BotCommands.deleteCommand}", "Delete files from GDrive, one or more links [owner only]"),
     (f"{BotCommands.WatchCommand}", "Mirror Youtube-dl support link"),
     (f"{BotCommands.ZipWatchCommand}", "Mirror Youtube playlist link as .zip"),
     (f"{BotCommands.TarWatchCommand}", "Mirror Youtube playlist link as .tar"),
@@ -181,6 +196,10 @@ def main():
         bot.edit_message_text("Restarted successfully!", chat_id, msg_id)
         os.remove(".restartmsg")
     bot.set_my_commands(botcmds)
+    if RECURSIVE_SEARCH and SEARCH_INDEX:
+        GoogleDriveHelper().start_drive_index()
+    if CONTENT_INDEX:
+        GoogleDriveHelper().start_content_index()
 
     start_handler = CommandHandler(
         BotCommands.StartCommand,
@@ -3,7 +3,6 @@ import shutil
 import sys
 import pathlib
 import tarfile
-import magic
 
 from bot import DOWNLOAD_DIR, LOGGER, aria2
 import subprocess
@@ -19,6 +18,9 @@ VIDEO_SUFFIXES = ("M4V", "MP4", "MOV", "FLV", "WMV", "3GP", "MPG", "WEBM", "MKV"
 
 fs = Filesplit()
 from .exceptions import NotSupportedExtractionArchive
+from .mime_detector import MimeDetector
+
+mime_detector = MimeDetector()
 
 
 def clean_download(path: str):
@@ -153,10 +155,14 @@ def get_base_name(orig_path: str):
 
 
 def get_mime_type(file_path):
-    mime = magic.Magic(mime=True)
-    mime_type = mime.from_file(file_path)
-    mime_type = mime_type or "text/plain"
-    return mime_type
+    return mime_detector.get(file_path)
+
+
+def prefetch_mime_types(path):
+    """Detects the types of the files under path in the background"""
+    if os.path.isdir(path):
+        mime_detector.prefetch(path)
+
 def take_ss(video_file):
     des_dir = 'Thumbnails'
     if not os.path.exists(des_dir):
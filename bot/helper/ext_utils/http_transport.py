@@ -0,0 +1,107 @@
+import http.cookiejar
+import threading
+import urllib.parse
+
+import httplib2
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+
+from bot import HTTP_POOL_SIZE
+
+
+class TransportStats:
+    """Requests sent and connections opened, per transport"""
+
+    def __init__(self):
+        self.__lock = threading.Lock()
+        self.__requests = {}
+        self.__connections = {}
+
+    def request(self, transport):
+        with self.__lock:
+            self.__requests[transport] = self.__requests.get(transport, 0) + 1
+
+    def connection(self, transport):
+        with self.__lock:
+            self.__connections[transport] = self.__connections.get(transport, 0) + 1
+
+    def stats(self):
+        """:return: dict of transport to (requests, requests on a reused connection)"""
+        with self.__lock:
+            return {
+                transport: (count, max(count - self.__connections.get(transport, 0), 0))
+                for transport, count in self.__requests.items()
+            }
+
+
+transport_stats = TransportStats()
+
+
+class _CountingPool:
+    def _new_conn(self):
+        transport_stats.connection("requests")
+        return super()._new_conn()
+
+    def _get_conn(self, timeout=None):
+        transport_stats.request("requests")
+        return super()._get_conn(timeout)
+
+
+class _CountingHTTPConnectionPool(_CountingPool, HTTPConnectionPool):
+    pass
+
+
+class _CountingHTTPSConnectionPool(_CountingPool, HTTPSConnectionPool):
+    pass
+
+
+class _PooledAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _CountingHTTPConnectionPool,
+            "https": _CountingHTTPSConnectionPool,
+        }
+
+
+def _new_session():
+    session = requests.Session()
+    # Up to HTTP_POOL_SIZE hosts, each with HTTP_POOL_SIZE idle connections
+    adapter = _PooledAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    # Only the connections are shared: cookies set for one user's request
+    # must not be sent with the requests of others
+    session.cookies.set_policy(http.cookiejar.DefaultCookiePolicy(allowed_domains=[]))
+    return session
+
+
+# Shared by every thread instead of the module level requests calls, so
+# connections to the same host are kept alive and reused
+session = _new_session()
+
+
+class _CountingHttp(httplib2.Http):
+    def request(self, uri, *args, **kwargs):
+        parts = urllib.parse.urlsplit(uri)
+        conn = self.connections.get(f"{parts.scheme.lower()}:{parts.netloc.lower()}")
+        transport_stats.request("httplib2")
+        if conn is None or conn.sock is None:
+            transport_stats.connection("httplib2")
+        return super().request(uri, *args, **kwargs)
+
+
+_local = threading.local()
+
+
+def thread_http(timeout=None):
+    """
+    :return: the httplib2 transport of this thread. httplib2 is not
+             thread-safe, and every service built on a thread shares the
+             thread's keep-alive connections this way.
+    """
+    http = getattr(_local, "http", None)
+    if http is None:
+        http = _local.http = _CountingHttp(timeout=timeout)
+    return http
@@ -0,0 +1,166 @@
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import magic
+
+# Types of suffixes common enough to skip sniffing the content, as
+# libmagic reports them
+KNOWN_TYPES = {
+    ".mkv": "video/x-matroska",
+    ".mp4": "video/mp4",
+    ".m4v": "video/x-m4v",
+    ".webm": "video/webm",
+    ".avi": "video/x-msvideo",
+    ".mov": "video/quicktime",
+    ".flv": "video/x-flv",
+    ".mp3": "audio/mpeg",
+    ".flac": "audio/flac",
+    ".ogg": "audio/ogg",
+    ".wav": "audio/x-wav",
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+    ".gif": "image/gif",
+    ".webp": "image/webp",
+    ".pdf": "application/pdf",
+    ".zip": "application/zip",
+    ".rar": "application/x-rar",
+    ".7z": "application/x-7z-compressed",
+    ".gz": "application/gzip",
+    ".tar": "application/x-tar",
+    ".iso": "application/x-iso9660-image",
+    ".epub": "application/epub+zip",
+    ".txt": "text/plain",
+}
+# Files sniffed by one task of the pool
+BATCH_SIZE = 256
+# Folders with fewer files to sniff are not worth the pool
+MIN_POOL_FILES = 32
+MAX_ENTRIES = 100000
+
+# One libmagic handle per thread, a handle is not safe to share and
+# loading its database is most of the cost of a lookup
+_local = threading.local()
+
+
+def _magic():
+    handle = getattr(_local, "magic", None)
+    if handle is None:
+        handle = _local.magic = magic.Magic(mime=True)
+    return handle
+
+
+def detect(path):
+    """:return: MIME type from the suffix if well known, else from the content"""
+    mime_type = KNOWN_TYPES.get(os.path.splitext(path)[1].lower())
+    if mime_type is None:
+        mime_type = _magic().from_file(path)
+    return mime_type or "text/plain"
+
+
+def _detect_batch(paths):
+    # Runs on a pool thread, which keeps its handle between batches.
+    # libmagic is called through ctypes, which releases the GIL.
+    return [detect(path) for path in paths]
+
+
+class MimeDetector:
+    """
+    MIME types of local files, cached by (path, size, mtime).
+
+    prefetch() sniffs a whole folder in a thread pool ahead of its upload,
+    get() then finds the type in the cache or waits for its batch instead
+    of sniffing the file a second time.
+    """
+
+    def __init__(self, workers=min(os.cpu_count() or 1, 4), max_entries=MAX_ENTRIES):
+        self.__workers = workers
+        self.__max_entries = max_entries
+        self.__lock = threading.Lock()
+        self.__cache = OrderedDict()
+        # key -> (future of its batch, index in the batch)
+        self.__pending = {}
+        self.__pool = None
+
+    @staticmethod
+    def __key(path):
+        stat = os.stat(path)
+        return os.path.abspath(path), stat.st_size, stat.st_mtime_ns
+
+    def __put(self, key, mime_type):
+        # Caller holds the lock
+        self.__cache[key] = mime_type
+        self.__cache.move_to_end(key)
+        while len(self.__cache) > self.__max_entries:
+            self.__cache.popitem(last=False)
+
+    def __get_pool(self):
+        # Caller holds the lock. Threads, not forked processes: forking the
+        # threaded bot process can deadlock the child.
+        if self.__pool is None:
+            self.__pool = ThreadPoolExecutor(max_workers=self.__workers)
+        return self.__pool
+
+    def get(self, path):
+        key = self.__key(path)
+        with self.__lock:
+            mime_type = self.__cache.get(key)
+            if mime_type is not None:
+                self.__cache.move_to_end(key)
+                return mime_type
+            pending = self.__pending.get(key)
+        if pending is not None:
+            future, index = pending
+            try:
+                return future.result()[index]
+            except Exception:
+                # Sniffed here instead
+                pass
+        mime_type = detect(path)
+        with self.__lock:
+            self.__put(key, mime_type)
+        return mime_type
+
+    def prefetch(self, directory):
+        """Starts sniffing every file under directory, without waiting for it"""
+        found = []
+        for dirpath, _, files in os.walk(directory):
+            for file in files:
+                try:
+                    found.append(self.__key(os.path.join(dirpath, file)))
+                except OSError:
+                    continue
+        keys = []
+        with self.__lock:
+            for key in found:
+                if key in self.__cache or key in self.__pending:
+                    continue
+                mime_type = KNOWN_TYPES.get(os.path.splitext(key[0])[1].lower())
+                if mime_type is not None:
+                    self.__put(key, mime_type)
+                else:
+                    keys.append(key)
+            if len(keys) < MIN_POOL_FILES:
+                return
+            pool = self.__get_pool()
+            batches = []
+            for start in range(0, len(keys), BATCH_SIZE):
+                batch = keys[start:start + BATCH_SIZE]
+                future = pool.submit(_detect_batch, [key[0] for key in batch])
+                for index, key in enumerate(batch):
+                    self.__pending[key] = (future, index)
+                batches.append((future, batch))
+        # Outside the lock, a batch done already runs its callback right here
+        for future, batch in batches:
+            future.add_done_callback(lambda future, batch=batch: self.__finish(future, batch))
+
+    def __finish(self, future, batch):
+        with self.__lock:
+            for key in batch:
+                self.__pending.pop(key, None)
+            if future.cancelled() or future.exception() is not None:
+                return
+            for key, mime_type in zip(batch, future.result()):
+                self.__put(key, mime_type)
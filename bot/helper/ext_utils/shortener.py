@@ -0,0 +1,110 @@
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from bot import SHORTENER, SHORTENER_API
+from bot.helper.ext_utils.http_transport import session
+
+LOGGER = logging.getLogger(__name__)
+
+# Seconds to wait for the shortener before the long URL is used instead
+TIMEOUT = 5
+MAX_ENTRIES = 20000
+
+
+class UrlShortener:
+    """
+    Shortens links through the SHORTENER api. Short links are cached on disk,
+    batches are shortened concurrently, and the long link is returned when
+    the shortener is not configured, slow or failing.
+    """
+
+    def __init__(self, domain, api_key, path="short_urls.json", workers=8):
+        self.__domain = domain
+        self.__api_key = api_key
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__cache = None
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+
+    @property
+    def enabled(self):
+        return self.__domain is not None and self.__api_key is not None
+
+    def __load(self):
+        # Caller holds the lock
+        if self.__cache is not None:
+            return
+        try:
+            with open(self.__path, "r") as f:
+                self.__cache = json.load(f)
+        except FileNotFoundError:
+            self.__cache = {}
+        except ValueError:
+            LOGGER.error(f"Discarding corrupt short URL cache: {self.__path}")
+            self.__cache = {}
+
+    def __save(self):
+        # Caller holds the lock
+        while len(self.__cache) > MAX_ENTRIES:
+            del self.__cache[next(iter(self.__cache))]
+        tmp_path = f"{self.__path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.__cache, f)
+        os.replace(tmp_path, self.__path)
+
+    def __cached(self, url):
+        with self.__lock:
+            self.__load()
+            return self.__cache.get(url)
+
+    def __fetch(self, url):
+        """:return: the short URL, None if the shortener did not give one"""
+        try:
+            response = session.get(
+                f"https://{self.__domain}/api",
+                params={"api": self.__api_key, "url": url, "format": "text"},
+                timeout=TIMEOUT,
+            )
+            short_url = response.text.strip()
+        except requests.RequestException as e:
+            LOGGER.error(f"Shortener failed, using the long link: {e}")
+            return None
+        if response.status_code != 200 or not short_url.startswith("http"):
+            LOGGER.error(f"Shortener answered {response.status_code}, using the long link")
+            return None
+        return short_url
+
+    def short_url(self, url):
+        return self.short_urls([url])[url]
+
+    def short_urls(self, urls):
+        """:return: dict of every url to its short URL, or to itself on failure"""
+        if not self.enabled:
+            return {url: url for url in urls}
+        result = {}
+        missing = []
+        for url in dict.fromkeys(urls):
+            short_url = self.__cached(url)
+            if short_url is None:
+                missing.append(url)
+            else:
+                result[url] = short_url
+        if missing:
+            fetched = dict(zip(missing, self.__executor.map(self.__fetch, missing)))
+            with self.__lock:
+                self.__load()
+                for url, short_url in fetched.items():
+                    if short_url is not None:
+                        self.__cache[url] = short_url
+                self.__save()
+            for url, short_url in fetched.items():
+                result[url] = short_url or url
+        return result
+
+
+shortener = UrlShortener(SHORTENER, SHORTENER_API)
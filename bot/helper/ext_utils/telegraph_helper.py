@@ -0,0 +1,84 @@
+import logging
+import random
+import string
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from telegraph import Telegraph
+
+LOGGER = logging.getLogger(__name__)
+
+
+class TelegraphHelper:
+    """
+    Publishes multi-page Telegraph results. The account is created on first
+    use instead of at startup. Pages are created at once by a long-lived
+    pool whose threads each keep one Telegraph client, and so one keep-alive
+    connection, between calls.
+    """
+
+    def __init__(self, author_name, author_url, workers=4):
+        self.__author_name = author_name
+        self.__author_url = author_url
+        self.__lock = threading.Lock()
+        self.__local = threading.local()
+        self.__token = None
+        self.__executor = ThreadPoolExecutor(max_workers=workers)
+
+    def __get_token(self):
+        with self.__lock:
+            if self.__token is None:
+                short_name = "".join(random.SystemRandom().choices(string.ascii_letters, k=8))
+                LOGGER.info(f"Generating Telegraph Token using '{short_name}' name")
+                telegraph = Telegraph()
+                telegraph.create_account(short_name=short_name)
+                self.__token = telegraph.get_access_token()
+                LOGGER.info(f"Telegraph Token Generated: '{self.__token}'")
+            return self.__token
+
+    def __client(self):
+        client = getattr(self.__local, "client", None)
+        if client is None:
+            client = self.__local.client = Telegraph(access_token=self.__get_token())
+        return client
+
+    def create_page(self, title, content):
+        """:return: path of the new page"""
+        return self.__client().create_page(
+            title=title,
+            author_name=self.__author_name,
+            author_url=self.__author_url,
+            html_content=content,
+        )["path"]
+
+    def edit_page(self, path, title, content):
+        self.__client().edit_page(
+            path=path,
+            title=title,
+            author_name=self.__author_name,
+            author_url=self.__author_url,
+            html_content=content,
+        )
+
+    def publish(self, title, contents):
+        """
+        Creates one page per content, then links each page to its neighbours
+        :return: paths of the pages, in the order of contents
+        """
+        self.__get_token()
+        paths = list(self.__executor.map(lambda content: self.create_page(title, content), contents))
+        if len(paths) > 1:
+            linked = []
+            for index, content in enumerate(contents):
+                links = []
+                if index > 0:
+                    links.append(f'<a href="https://telegra.ph/{paths[index - 1]}">Prev</a>')
+                if index < len(paths) - 1:
+                    links.append(f'<a href="https://telegra.ph/{paths[index + 1]}">Next</a>')
+                linked.append((paths[index], content + f'<b>{" | ".join(links)}</b>'))
+            # Consume the results, so a failed edit raises here
+            list(self.__executor.map(lambda page: self.edit_page(page[0], title, page[1]), linked))
+        return paths
+
+
+telegraph = TelegraphHelper("Repo Link", "https://github.com/harshpreets63/Mirror-Bot")
@@ -0,0 +1,93 @@
+import math
+import threading
+import time
+from collections import deque
+
+# Seconds of history behind the windowed rate
+WINDOW = 10
+# Time constant of the smoothed rate, in seconds
+EWMA_TAU = 5
+
+
+class ThroughputMeter:
+    """
+    Transfer rate from the bytes actually moved, fed by byte callbacks.
+
+    rate() is the bytes seen over the last WINDOW seconds, ewma() a rate
+    smoothed with a time constant of EWMA_TAU seconds. Both count from the
+    creation of the meter and fall towards zero while no bytes arrive, so
+    a stalled transfer shows as stalled instead of keeping its old average.
+    """
+
+    def __init__(self, window=WINDOW, tau=EWMA_TAU):
+        self.__window = window
+        self.__tau = tau
+        self.__lock = threading.Lock()
+        self.__samples = deque()
+        self.__window_bytes = 0
+        self.__start = self.__last = time.monotonic()
+        # Weighted sum of the rates and of their weights; their ratio is
+        # the average without the bias towards 0 of a fresh EWMA
+        self.__ewma = 0
+        self.__weight = 0
+        self.__position = 0
+        self.total = 0
+
+    def add(self, size):
+        """Counts size bytes moved since the previous call"""
+        if size <= 0:
+            return
+        now = time.monotonic()
+        with self.__lock:
+            self.total += size
+            elapsed = now - self.__last
+            if elapsed > 0:
+                decay = math.exp(-elapsed / self.__tau)
+                self.__ewma = self.__ewma * decay + (1 - decay) * size / elapsed
+                self.__weight = self.__weight * decay + (1 - decay)
+                self.__last = now
+            elif self.__weight > 0:
+                # Same clock tick as the previous call, fold it in there
+                self.__ewma += size / self.__tau
+            self.__samples.append((now, size))
+            self.__window_bytes += size
+            self.__trim(now)
+
+    def update(self, position):
+        """
+        Feeds a callback that reports how far it got instead of how much
+        it moved. A position going back starts counting from there.
+        """
+        with self.__lock:
+            size = position - self.__position
+            self.__position = position
+        self.add(size)
+
+    def __trim(self, now):
+        # Caller holds the lock
+        while self.__samples and self.__samples[0][0] < now - self.__window:
+            self.__window_bytes -= self.__samples.popleft()[1]
+
+    def rate(self):
+        """:return: bytes per second over the last WINDOW seconds"""
+        now = time.monotonic()
+        with self.__lock:
+            self.__trim(now)
+            span = min(now - self.__start, self.__window)
+            if span <= 0:
+                return 0
+            return self.__window_bytes / span
+
+    def ewma(self):
+        """:return: smoothed bytes per second"""
+        now = time.monotonic()
+        with self.__lock:
+            if self.__weight == 0:
+                return 0
+            # The time since the last bytes counts as time at 0 bytes/s
+            decay = math.exp(-(now - self.__last) / self.__tau)
+            return self.__ewma * decay / (self.__weight * decay + 1 - decay)
+
+    def speed(self):
+        """:return: the rate shown to users, in bytes per second"""
+        return self.ewma()
@@ -18,13 +18,14 @@ from random import choice
 from urllib.parse import urlparse
 
 import lk21
-import requests, cfscrape
+import cfscrape
 from bs4 import BeautifulSoup
 from js2py import EvalJs
 from lk21.extractors.bypasser import Bypass
 from base64 import standard_b64encode
 from bot.helper.telegram_helper.bot_commands import BotCommands
 from bot.helper.ext_utils.exceptions import DirectDownloadLinkException
+from bot.helper.ext_utils.http_transport import session
 
 
 def direct_link_generator(link: str):
@@ -103,7 +104,7 @@ def zippy_share(url: str) -> str:
         raise DirectDownloadLinkException("No Zippyshare links found")
     try:
         base_url = re.search('http.+.zippyshare.com', link).group()
-        response = requests.get(link).content
+        response = session.get(link).content
         pages = BeautifulSoup(response, "lxml")
         try:
             js_script = pages.find("div", {"class": "center"}).find_all("script")[1]
@@ -129,7 +130,7 @@ def yandex_disk(url: str) -> str:
         return "No Yandex.Disk links found\n"
     api = 'https://cloud-api.yandex.net/v1/disk/public/resources/download?public_key={}'
     try:
-        return requests.get(api.format(link)).json()['href']
+        return session.get(api.format(link)).json()['href']
     except KeyError:
         raise DirectDownloadLinkException("ERROR: File not found/Download limit reached\n")
 
@@ -139,7 +140,7 @@ def mediafire(url: str) -> str:
         link = re.findall(r'\bhttps?://.*mediafire\.com\S+', url)[0]
     except IndexError:
         raise DirectDownloadLinkException("No MediaFire links found\n")
-    page = BeautifulSoup(requests.get(link).content, 'lxml')
+    page = BeautifulSoup(session.get(link).content, 'lxml')
     info = page.find('a', {'aria-label': 'Download file'})
     return info.get('href')
 
@@ -152,7 +153,7 @@ def osdn(url: str) -> str:
     except IndexError:
         raise DirectDownloadLinkException("No OSDN links found\n")
     page = BeautifulSoup(
-        requests.get(link, allow_redirects=True).content, 'lxml')
+        session.get(link, allow_redirects=True).content, 'lxml')
     info = page.find('a', {'class': 'mirror_link'})
     link = urllib.parse.unquote(osdn_link + info['href'])
     mirrors = page.find('form', {'id': 'mirror-select-form'}).findAll('tr')
@@ -169,7 +170,9 @@ def github(url: str) -> str:
         re.findall(r'\bhttps?://.*github\.com.*releases\S+', url)[0]
     except IndexError:
         raise DirectDownloadLinkException("No GitHub Releases links found\n")
-    download = requests.get(url, stream=True, allow_redirects=False)
+    download = session.get(url, stream=True, allow_redirects=False)
+    # Only the headers are needed, give the connection back to the pool
+    download.close()
     try:
         return download.headers["location"]
     except KeyError:
@@ -234,12 +237,12 @@ def onedrive(link: str) -> str:
     link_without_query = urlparse(link)._replace(query=None).geturl()
     direct_link_encoded = str(standard_b64encode(bytes(link_without_query, "utf-8")), "utf-8")
     direct_link1 = f"https://api.onedrive.com/v1.0/shares/u!{direct_link_encoded}/root/content"
-    resp = requests.head(direct_link1)
+    resp = session.head(direct_link1)
     if resp.status_code != 302:
         return "ERROR: Unauthorized link, the link may be private"
     dl_link = resp.next.url
     file_name = dl_link.rsplit("/", 1)[1]
-    resp2 = requests.head(dl_link)
+    resp2 = session.head(dl_link)
     return dl_link
 
 
@@ -249,7 +252,7 @@ def pixeldrain(url: str) -> str:
     file_id = url.split("/")[-1]
     info_link = f"https://pixeldrain.com/api/file/{file_id}/info"
     dl_link = f"https://pixeldrain.com/api/file/{file_id}"
-    resp = requests.get(info_link).json()
+    resp = session.get(info_link).json()
     if resp["success"]:
         return dl_link
     else:
@@ -307,10 +310,10 @@ def fichier(link: str) -> str:
       url = link
     try:
       if pswd is None:
-        req = requests.post(url)
+        req = session.post(url)
       else:
         pw = {"pass": pswd}
-        req = requests.post(url, data=pw)
+        req = session.post(url, data=pw)
     except:
       raise DirectDownloadLinkException("ERROR: Unable to reach 1fichier server!")
     if req.status_code == 404:
@@ -358,7 +361,7 @@ def solidfiles(url: str) -> str:
     headers = {
         'User-Agent': 'Mozilla/5.0 (Macintosh; Intel Mac OS X 10_9_4) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/36.0.1985.125 Safari/537.36'
     }
-    pageSource = requests.get(url, headers = headers).text
+    pageSource = session.get(url, headers = headers).text
     mainOptions = str(re.search(r'viewerOptions\'\,\ (.*?)\)\;', pageSource).group(1))
     return json.loads(mainOptions)["downloadUrl"]
 
@@ -368,7 +371,7 @@ def useragent():
     useragent random setter
     """
     useragents = BeautifulSoup(
-        requests.get(
+        session.get(
             'https://developers.whatismybrowser.com/'
             'useragents/explore/operating_system_name/android/').content,
         'lxml').findAll('td', {'class': 'useragent'})
@@ -5,6 +5,7 @@ from megasdkrestclient import MegaSdkRestClient, constants
 
 from bot import LOGGER, download_dict, download_dict_lock
 from bot.helper.ext_utils.bot_utils import setInterval
+from bot.helper.ext_utils.throughput import ThroughputMeter
 
 from ..status_utils.mega_status import MegaDownloadStatus
 
@@ -21,6 +22,7 @@ class MegaDownloader:
         self.__mega_client = MegaSdkRestClient("http://localhost:6090")
         self.__periodic = None
         self.__downloaded_bytes = 0
+        self.__meter = ThroughputMeter()
         self.__progress = 0
         self.__size = 0
 
@@ -51,8 +53,7 @@ class MegaDownloader:
 
     @property
     def download_speed(self):
-        if self.gid is not None:
-            return self.__mega_client.getDownloadInfo(self.gid)["speed"]
+        return self.__meter.speed()
 
     def __onDownloadStart(self, name, size, gid):
         self.__periodic = setInterval(self.POLLING_INTERVAL, self.__onInterval)
@@ -92,6 +93,7 @@ class MegaDownloader:
     def __onDownloadProgress(self, current, total):
         with self.__resource_lock:
             self.__downloaded_bytes = current
+            self.__meter.update(current)
             try:
                 self.__progress = current / total * 100
             except ZeroDivisionError:
@@ -0,0 +1,119 @@
+import mimetypes
+import os
+import random
+import re
+import string
+import threading
+import urllib.parse
+
+import requests
+
+from bot import LOGGER, download_dict, download_dict_lock
+from bot.helper.ext_utils.http_transport import session
+
+from ..status_utils.upload_status import UploadStatus
+from ..upload_utils import gdriveTools
+
+# Seconds to wait for the source to answer
+TIMEOUT = 30
+# Pages and torrents are not files to mirror as they are
+NOT_STREAMED = ("text/html", "application/x-bittorrent", "application/metalink4+xml")
+# aria2 opens these itself, they are often served as application/octet-stream
+ARIA2_SUFFIXES = (".torrent", ".metalink", ".meta4")
+
+
+def is_streamable(link):
+    """:return: False for links that are not worth probing as a plain file"""
+    if not link.startswith(("http://", "https://")):
+        return False
+    path = urllib.parse.urlparse(link).path.lower()
+    return not path.endswith(ARIA2_SUFFIXES)
+
+
+def open_stream(link, offset=0):
+    """
+    :param offset: first byte wanted, sent as a Range request
+    :return: the streamed response of a plain http(s) file, or None
+    """
+    # The bytes are stored as sent, so ask for them unencoded
+    headers = {"Accept-Encoding": "identity"}
+    if offset:
+        headers["Range"] = f"bytes={offset}-"
+    try:
+        response = session.get(link, stream=True, timeout=TIMEOUT, headers=headers)
+    except requests.RequestException as e:
+        LOGGER.info(f"Not streaming {link}: {e}")
+        return None
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip().lower()
+    if offset:
+        ok = response.status_code == 206 and response.headers.get(
+            "Content-Range", ""
+        ).startswith(f"bytes {offset}-")
+    else:
+        ok = response.status_code == 200 and content_type not in NOT_STREAMED
+    if not ok:
+        response.close()
+        return None
+    return response
+
+
+def get_file_name(response):
+    disposition = response.headers.get("Content-Disposition", "")
+    match = re.search(r"filename\*\s*=\s*[\w-]+''([^;]+)", disposition)
+    if match is not None:
+        return urllib.parse.unquote(match.group(1).strip())
+    match = re.search(r'filename\s*=\s*"?([^";]+)"?', disposition)
+    if match is not None:
+        return match.group(1).strip()
+    name = os.path.basename(urllib.parse.urlparse(response.url).path)
+    return urllib.parse.unquote(name) or "file"
+
+
+class StreamMirrorHelper:
+    """
+    Mirrors a plain http(s) file by uploading it to drive while it
+    downloads, instead of downloading it to DOWNLOAD_DIR with aria2 first
+    """
+
+    def __init__(self, listener):
+        self.__listener = listener
+
+    def add_download(self, link, name="", fallback=None):
+        """
+        Probes the link on a thread of its own, the command handler does not
+        wait for the source
+        :param fallback: called instead if the link is not a plain file
+        :return: False if the link is not worth probing, to download it with aria2
+        """
+        if not is_streamable(link):
+            return False
+        threading.Thread(target=self.__start, args=(link, name, fallback)).start()
+        return True
+
+    def __start(self, link, name, fallback):
+        response = open_stream(link)
+        if response is None:
+            if fallback is not None:
+                fallback()
+            return
+        name = name or get_file_name(response)
+        mime_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+        if not mime_type or mime_type == "application/octet-stream":
+            mime_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+        size = None
+        if "Content-Length" in response.headers and "Content-Encoding" not in response.headers:
+            size = int(response.headers["Content-Length"])
+        reopen = None
+        if response.headers.get("Accept-Ranges", "").lower() == "bytes":
+            # A dropped source continues where it stopped
+            reopen = lambda offset: open_stream(link, offset)
+        gid = "".join(
+            random.SystemRandom().choices(string.ascii_letters + string.digits, k=12)
+        )
+        drive = gdriveTools.GoogleDriveHelper(name, self.__listener)
+        with download_dict_lock:
+            download_dict[self.__listener.uid] = UploadStatus(
+                drive, size or 0, gid, self.__listener
+            )
+        LOGGER.info(f"Streaming {link} to drive as {name}")
+        drive.upload_stream(response, name, mime_type, size, reopen)
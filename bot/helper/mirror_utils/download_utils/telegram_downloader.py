@@ -1,8 +1,8 @@
 import logging
 import threading
-import time
 
 from bot import LOGGER, app, download_dict, download_dict_lock
+from bot.helper.ext_utils.throughput import ThroughputMeter
 
 from ..status_utils.telegram_download_status import TelegramDownloadStatus
 from .download_helper import DownloadHelper
@@ -20,7 +20,7 @@ class TelegramDownloadHelper(DownloadHelper):
         self.__resource_lock = threading.RLock()
         self.__name = ""
         self.__gid = ""
-        self.__start_time = time.time()
+        self.__meter = ThroughputMeter()
         self.__user_bot = app
         self.__is_cancelled = False
 
@@ -31,8 +31,7 @@ class TelegramDownloadHelper(DownloadHelper):
 
     @property
     def download_speed(self):
-        with self.__resource_lock:
-            return self.downloaded_bytes / (time.time() - self.__start_time)
+        return self.__meter.speed()
 
     def __onDownloadStart(self, name, size, file_id):
         with download_dict_lock:
@@ -54,6 +53,7 @@ class TelegramDownloadHelper(DownloadHelper):
             return
         with self.__resource_lock:
             self.downloaded_bytes = current
+            self.__meter.update(current)
             try:
                 self.progress = current / self.size * 100
             except ZeroDivisionError:
@@ -6,6 +6,7 @@ import time
 from yt_dlp import DownloadError, YoutubeDL
 
 from bot import download_dict, download_dict_lock
+from bot.helper.ext_utils.throughput import ThroughputMeter
 
 from ..status_utils.youtube_dl_download_status import YoutubeDLDownloadStatus
 from .download_helper import DownloadHelper
@@ -48,7 +49,7 @@ class YoutubeDLHelper(DownloadHelper):
             "logger": MyLogger(self),
             "usenetrc": True,
         }
-        self.__download_speed = 0
+        self.__meter = ThroughputMeter()
         self.download_speed_readable = ""
         self.downloaded_bytes = 0
         self.size = 0
@@ -60,8 +61,7 @@ class YoutubeDLHelper(DownloadHelper):
 
     @property
     def download_speed(self):
-        with self.__resource_lock:
-            return self.__download_speed
+        return self.__meter.speed()
 
     @property
     def gid(self):
@@ -76,7 +76,6 @@ class YoutubeDLHelper(DownloadHelper):
                 self.last_downloaded = 0
         elif d["status"] == "downloading":
             with self.__resource_lock:
-                self.__download_speed = d["speed"]
                 try:
                     tbyte = d["total_bytes"]
                 except KeyError:
@@ -93,6 +92,7 @@ class YoutubeDLHelper(DownloadHelper):
                 else:
                     self.download_speed_readable = d["_speed_str"]
                     self.downloaded_bytes = d["downloaded_bytes"]
+                self.__meter.update(self.downloaded_bytes)
 
     def __onDownloadStart(self):
         with download_dict_lock:
@@ -46,6 +46,12 @@ class AriaDownloadStatus(Status):
     def processed_bytes(self):
         return self.aria_download().completed_length
 
+    def speed_raw(self):
+        """
+        :return: Download speed in Bytes/Seconds, as measured by aria2 like its eta
+        """
+        return self.aria_download().download_speed
+
     def speed(self):
         return self.aria_download().download_speed_string()
 
@@ -42,7 +42,7 @@ class CloneStatus(Status):
         """
         :return: Download speed in Bytes/Seconds
         """
-        return self.cobj.cspeed()
+        return self.cobj.speed()
 
     def speed(self):
         return f'{get_readable_file_size(self.speed_raw())}/s'
@@ -18,6 +18,9 @@ class ExtractStatus(Status):
     def speed(self):
         return "0"
 
+    def speed_raw(self):
+        return 0
+
     def name(self):
         return self.__name
 
@@ -50,7 +50,7 @@ class DownloadStatus(Status):
         """
         :return: Download speed in Bytes/Seconds
         """
-        return self.dobj.dspeed()
+        return self.dobj.speed()
 
     def speed(self):
         return f"{get_readable_file_size(self.speed_raw())}/s"
@@ -21,6 +21,9 @@ class SplitStatus(Status):
     def speed(self):
         return '0'
 
+    def speed_raw(self):
+        return 0
+
     def name(self):
         return self.__name
 
@@ -10,6 +10,10 @@ class Status:
         raise NotImplementedError
 
     def speed(self):
+        """:return: readable speed"""
+        raise NotImplementedError
+
+    def speed_raw(self):
         """:return: speed in bytes per second"""
         raise NotImplementedError
 
@@ -0,0 +1,66 @@
+import threading
+
+# Drive wants every chunk but the last to be a multiple of 256 KB
+CHUNK_ALIGN = 256 * 1024
+MIN_CHUNK_SIZE = 4 * 1024 * 1024
+MAX_CHUNK_SIZE = 128 * 1024 * 1024
+DEFAULT_CHUNK_SIZE = 50 * 1024 * 1024
+# Chunks are sized to take about this long on the measured link
+TARGET_CHUNK_TIME = 8
+# Weight of the newest sample in the throughput average
+EWMA_ALPHA = 0.3
+
+# Key: upload host
+# Value: [average throughput in bytes/s, variance of it]
+_history = {}
+_history_lock = threading.Lock()
+
+
+def _align(size):
+    size = min(max(int(size), MIN_CHUNK_SIZE), MAX_CHUNK_SIZE)
+    return size - size % CHUNK_ALIGN
+
+
+class ChunkSizer:
+    """
+    Picks the chunk size of one resumable upload. It grows the chunk while
+    the link is fast and stable and halves it after an error, so a bad link
+    resends less data. Throughput is remembered per host, so the next upload
+    to the same host starts with a fitting size.
+    """
+
+    def __init__(self, host):
+        self.__host = host
+        with _history_lock:
+            history = _history.get(host)
+        if history is None:
+            self.__size = DEFAULT_CHUNK_SIZE
+        else:
+            self.__size = _align(history[0] * TARGET_CHUNK_TIME)
+
+    def chunk_size(self):
+        return self.__size
+
+    def record(self, size, seconds):
+        """Feeds the time one confirmed chunk of size bytes took"""
+        if size <= 0 or seconds <= 0:
+            return
+        throughput = size / seconds
+        with _history_lock:
+            history = _history.get(self.__host)
+            if history is None:
+                history = _history[self.__host] = [throughput, 0.0]
+            else:
+                diff = throughput - history[0]
+                history[0] += EWMA_ALPHA * diff
+                history[1] = (1 - EWMA_ALPHA) * (history[1] + EWMA_ALPHA * diff * diff)
+            average, variance = history
+        stable = variance ** 0.5 < average / 4
+        if seconds < TARGET_CHUNK_TIME / 2 and stable:
+            self.__size = _align(self.__size * 2)
+        elif seconds > TARGET_CHUNK_TIME * 2:
+            self.__size = _align(average * TARGET_CHUNK_TIME)
+
+    def record_error(self):
+        """A chunk failed or timed out"""
+        self.__size = _align(self.__size // 2)
@@ -0,0 +1,164 @@
+import sqlite3
+import threading
+import time
+import uuid
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    job TEXT NOT NULL,
+    source_id TEXT NOT NULL,
+    dest_id TEXT NOT NULL,
+    PRIMARY KEY (job, source_id)
+);
+CREATE TABLE IF NOT EXISTS jobs (
+    job TEXT PRIMARY KEY,
+    target TEXT NOT NULL,
+    owner TEXT,
+    state TEXT NOT NULL,
+    updated REAL NOT NULL
+);
+"""
+# Copied items kept in memory before they are written in one transaction
+COMMIT_ITEMS = 500
+# Seconds an item may wait in memory before it is written
+COMMIT_INTERVAL = 2
+
+
+class CloneJournal:
+    """
+    On-disk map of source ids to destination ids for every folder clone in
+    progress. A clone that stopped halfway, on quota exhaustion or a crash,
+    resumes with only the items missing from its journal.
+
+    A job is one run of a source folder cloned into one destination parent,
+    owned by the task that started it. Only jobs no task of this process is
+    running can be taken over by a new clone of the same folder.
+    """
+
+    def __init__(self, path="clone_journal.db"):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__db = None
+        # Jobs running in this process
+        self.__active = set()
+        # Key: (job, source_id), Value: dest_id, not written yet
+        self.__pending = {}
+        self.__last_commit = time.monotonic()
+
+    def __connect(self):
+        # Caller holds the lock
+        if self.__db is None:
+            self.__db = sqlite3.connect(self.__path, check_same_thread=False)
+            self.__db.executescript(SCHEMA)
+        return self.__db
+
+    @staticmethod
+    def __target(source_id, parent_id):
+        return f"{parent_id}/{source_id}"
+
+    def __stopped_job(self, target):
+        # Caller holds the lock. Jobs left "running" by a crash count too.
+        for (job,) in self.__connect().execute(
+            "SELECT job FROM jobs WHERE target = ? ORDER BY updated DESC", (target,)
+        ):
+            if job not in self.__active:
+                return job
+        return None
+
+    def __set_state(self, job, state, owner=None):
+        # Caller holds the lock
+        db = self.__connect()
+        with db:
+            db.execute(
+                "UPDATE jobs SET state = ?, owner = COALESCE(?, owner), updated = ? WHERE job = ?",
+                (state, owner, time.time(), job),
+            )
+
+    def start(self, source_id, parent_id, owner):
+        """
+        Takes over a stopped job of the same clone, or starts a new one
+        :return: (job, whether it resumes a stopped job)
+        """
+        target = self.__target(source_id, parent_id)
+        with self.__lock:
+            job = self.__stopped_job(target)
+            resumed = job is not None
+            if resumed:
+                self.__set_state(job, "running", str(owner))
+            else:
+                job = f"{target}/{uuid.uuid4().hex[:12]}"
+                db = self.__connect()
+                with db:
+                    db.execute(
+                        "INSERT INTO jobs (job, target, owner, state, updated) VALUES (?, ?, ?, ?, ?)",
+                        (job, target, str(owner), "running", time.time()),
+                    )
+            self.__active.add(job)
+        return job, resumed
+
+    def resumable(self, source_id, parent_id):
+        """:return: True if a stopped clone of source_id into parent_id can resume"""
+        with self.__lock:
+            return self.__stopped_job(self.__target(source_id, parent_id)) is not None
+
+    def get(self, job, source_id):
+        """:return: id of the copy of source_id, None if not copied yet"""
+        with self.__lock:
+            dest_id = self.__pending.get((job, source_id))
+            if dest_id is not None:
+                return dest_id
+            row = self.__connect().execute(
+                "SELECT dest_id FROM items WHERE job = ? AND source_id = ?", (job, source_id)
+            ).fetchone()
+        return row[0] if row else None
+
+    def add(self, job, source_id, dest_id):
+        with self.__lock:
+            self.__pending[(job, source_id)] = dest_id
+            if (
+                len(self.__pending) >= COMMIT_ITEMS
+                or time.monotonic() - self.__last_commit >= COMMIT_INTERVAL
+            ):
+                self.__commit()
+
+    def __commit(self):
+        # Caller holds the lock
+        self.__last_commit = time.monotonic()
+        if not self.__pending:
+            return
+        pending, self.__pending = self.__pending, {}
+        db = self.__connect()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO items (job, source_id, dest_id) VALUES (?, ?, ?)",
+                [(job, source_id, dest_id) for (job, source_id), dest_id in pending.items()],
+            )
+
+    def stop(self, job):
+        """Keeps the journal of a job for a later clone to resume it"""
+        with self.__lock:
+            self.__commit()
+            self.__set_state(job, "stopped")
+            self.__active.discard(job)
+
+    def restart(self, job):
+        """Drops what a job copied, its destination is gone"""
+        with self.__lock:
+            self.__drop_items(job)
+
+    def forget(self, job):
+        with self.__lock:
+            self.__drop_items(job)
+            db = self.__connect()
+            with db:
+                db.execute("DELETE FROM jobs WHERE job = ?", (job,))
+            self.__active.discard(job)
+
+    def __drop_items(self, job):
+        # Caller holds the lock
+        self.__pending = {
+            key: dest_id for key, dest_id in self.__pending.items() if key[0] != job
+        }
+        db = self.__connect()
+        with db:
+            db.execute("DELETE FROM items WHERE job = ?", (job,))
@@ -0,0 +1,261 @@
+import logging
+import sqlite3
+import threading
+
+from googleapiclient.errors import HttpError
+
+LOGGER = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+ITEM_FIELDS = "id, name, mimeType, md5Checksum, size, parents"
+# Folders listed by one query while walking a subtree
+PARENTS_PER_QUERY = 50
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    id TEXT PRIMARY KEY,
+    parent TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    md5 TEXT,
+    size INTEGER
+);
+CREATE INDEX IF NOT EXISTS items_content ON items (md5, size);
+CREATE INDEX IF NOT EXISTS items_size ON items (size);
+CREATE INDEX IF NOT EXISTS items_parent ON items (parent);
+CREATE TABLE IF NOT EXISTS state (
+    root TEXT PRIMARY KEY,
+    drive_id TEXT,
+    page_token TEXT NOT NULL
+);
+"""
+
+UPSERT = """
+INSERT INTO items (id, parent, name, mime_type, md5, size) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    parent = excluded.parent,
+    name = excluded.name,
+    mime_type = excluded.mime_type,
+    md5 = excluded.md5,
+    size = excluded.size
+"""
+
+DELETE_SUBTREE = """
+WITH RECURSIVE subtree (id) AS (
+    SELECT ?
+    UNION ALL
+    SELECT items.id FROM items JOIN subtree ON items.parent = subtree.id
+)
+DELETE FROM items WHERE id IN subtree
+"""
+
+
+class ContentIndex:
+    """
+    On-disk index of the md5Checksum and size of every file under one root
+    folder, normally GDRIVE_FOLDER_ID.
+
+    The tree is listed once together with a start page token of the Drive
+    changes feed, later syncs only apply the changes since then. Folders
+    are kept as well, to tell whether a changed file is inside the tree.
+    """
+
+    def __init__(self, path="content_index.db"):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__db = None
+        self.__root = None
+
+    def __connect(self):
+        # Caller holds the lock
+        if self.__db is None:
+            self.__db = sqlite3.connect(self.__path, check_same_thread=False)
+            self.__db.executescript(SCHEMA)
+        return self.__db
+
+    def ready(self):
+        return self.__root is not None
+
+    def find(self, md5, size):
+        """
+        :return: (id, name) of a file under the root with this content, or None
+        """
+        if md5 is None or not self.ready():
+            return None
+        with self.__lock:
+            return self.__connect().execute(
+                "SELECT id, name FROM items WHERE md5 = ? AND size = ? LIMIT 1",
+                (md5, int(size)),
+            ).fetchone()
+
+    def has_size(self, size):
+        """Cheap check before hashing a local file"""
+        if not self.ready():
+            return False
+        with self.__lock:
+            return self.__connect().execute(
+                "SELECT 1 FROM items WHERE size = ? AND md5 IS NOT NULL LIMIT 1", (int(size),)
+            ).fetchone() is not None
+
+    def sync(self, service, root):
+        with self.__lock:
+            state = self.__connect().execute(
+                "SELECT drive_id, page_token FROM state WHERE root = ?", (root,)
+            ).fetchone()
+        if state is not None:
+            try:
+                self.__update(service, root, *state)
+                self.__root = root
+                return
+            except HttpError as err:
+                if err.resp.status not in [400, 404, 410]:
+                    raise err
+                LOGGER.info("Changes page token of the content index expired, listing again")
+        self.__build(service, root)
+        self.__root = root
+
+    def __write(self, items=(), removed=(), state=None):
+        with self.__lock:
+            db = self.__connect()
+            with db:
+                for id in removed:
+                    db.execute(DELETE_SUBTREE, (id,))
+                db.executemany(
+                    UPSERT,
+                    [
+                        (
+                            item["id"],
+                            parent,
+                            item["name"],
+                            item["mimeType"],
+                            item.get("md5Checksum"),
+                            int(item["size"]) if "size" in item else None,
+                        )
+                        for item, parent in items
+                    ],
+                )
+                if state is not None:
+                    db.execute("DELETE FROM state")
+                    db.execute(
+                        "INSERT INTO state (root, drive_id, page_token) VALUES (?, ?, ?)", state
+                    )
+
+    def __build(self, service, root):
+        drive_id = (
+            service.files()
+            .get(fileId=root, supportsAllDrives=True, fields="driveId")
+            .execute()
+            .get("driveId")
+        )
+        # Take the token first, so changes made while listing are not lost
+        page_token = (
+            service.changes()
+            .getStartPageToken(**self.__changes_args(drive_id, start=True))
+            .execute()["startPageToken"]
+        )
+        with self.__lock:
+            db = self.__connect()
+            with db:
+                db.execute("DELETE FROM items")
+                db.execute("DELETE FROM state")
+        count = self.__add_subtree(service, [root])
+        self.__write(state=(root, drive_id, page_token))
+        LOGGER.info(f"Content index holds {count} items under {root}")
+
+    def __add_subtree(self, service, folder_ids):
+        count = 0
+        level = list(folder_ids)
+        while level:
+            group, level = level[:PARENTS_PER_QUERY], level[PARENTS_PER_QUERY:]
+            q = " or ".join(f"'{folder_id}' in parents" for folder_id in group)
+            q = f"({q}) and trashed = false"
+            page_token = None
+            while True:
+                response = (
+                    service.files()
+                    .list(
+                        supportsAllDrives=True,
+                        includeItemsFromAllDrives=True,
+                        q=q,
+                        spaces="drive",
+                        pageSize=1000,
+                        fields=f"nextPageToken, files({ITEM_FIELDS})",
+                        pageToken=page_token,
+                    )
+                    .execute()
+                )
+                items = []
+                for item in response.get("files", []):
+                    parent = next((p for p in item.get("parents", []) if p in group), group[0])
+                    items.append((item, parent))
+                    if item["mimeType"] == FOLDER_MIME_TYPE:
+                        level.append(item["id"])
+                self.__write(items)
+                count += len(items)
+                page_token = response.get("nextPageToken")
+                if page_token is None:
+                    break
+        return count
+
+    @staticmethod
+    def __changes_args(drive_id, start=False):
+        if drive_id is None:
+            return {}
+        args = {"driveId": drive_id, "supportsAllDrives": True}
+        if not start:
+            args["includeItemsFromAllDrives"] = True
+        return args
+
+    def __in_tree(self, root, folder_id):
+        if folder_id == root:
+            return True
+        with self.__lock:
+            return self.__connect().execute(
+                "SELECT 1 FROM items WHERE id = ? AND mime_type = ?",
+                (folder_id, FOLDER_MIME_TYPE),
+            ).fetchone() is not None
+
+    def __update(self, service, root, drive_id, page_token):
+        changed = 0
+        while page_token is not None:
+            response = (
+                service.changes()
+                .list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    fields=(
+                        "nextPageToken, newStartPageToken, "
+                        f"changes(fileId, removed, file({ITEM_FIELDS}, trashed))"
+                    ),
+                    **self.__changes_args(drive_id),
+                )
+                .execute()
+            )
+            for change in response.get("changes", []):
+                if "fileId" not in change:
+                    continue
+                file = change.get("file")
+                parent = None
+                if file is not None and not change.get("removed") and not file.get("trashed"):
+                    parent = next(
+                        (p for p in file.get("parents", []) if self.__in_tree(root, p)), None
+                    )
+                if parent is None:
+                    # Deleted, trashed or moved out of the tree
+                    self.__write(removed=[change["fileId"]])
+                    continue
+                new_folder = file["mimeType"] == FOLDER_MIME_TYPE and not self.__in_tree(
+                    root, file["id"]
+                )
+                self.__write([(file, parent)])
+                if new_folder:
+                    # A folder moved into the tree brings its contents along
+                    self.__add_subtree(service, [file["id"]])
+                changed += 1
+            page_token = response.get("nextPageToken")
+            if "newStartPageToken" in response:
+                self.__write(state=(root, drive_id, response["newStartPageToken"]))
+            elif page_token is not None:
+                self.__write(state=(root, drive_id, page_token))
+        if changed:
+            LOGGER.info(f"Applied {changed} changes to the content index")
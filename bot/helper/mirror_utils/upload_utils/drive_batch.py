@@ -0,0 +1,116 @@
+import logging
+import random
+import threading
+import time
+
+from googleapiclient.errors import HttpError
+
+from bot.helper.mirror_utils.upload_utils.drive_scheduler import is_rate_limited
+from bot.helper.mirror_utils.upload_utils.drive_service import drive_scheduler
+
+LOGGER = logging.getLogger(__name__)
+
+# Drive accepts at most 100 calls in one batch request
+BATCH_LIMIT = 100
+RETRY_ATTEMPTS = 5
+RETRY_STATUSES = (403, 429, 500, 502, 503)
+
+
+class DriveBatch:
+    """
+    Queues small Drive metadata calls (folder creation, permission grants)
+    and sends them up to BATCH_LIMIT at a time through new_batch_http_request.
+
+    Calls are queued as factories taking a service object, so the request is
+    only built on the thread that flushes it: httplib2 transports must not be
+    shared between threads. Only calls added with retry=True are sent again
+    on a retryable error: a create that failed on the way back may have
+    succeeded, and sending it again would make a duplicate.
+    """
+
+    def __init__(self, limit=BATCH_LIMIT):
+        self.__limit = min(limit, BATCH_LIMIT)
+        self.__lock = threading.Lock()
+        self.__queue = []
+        self.requests = 0
+        self.round_trips = 0
+
+    @property
+    def saved_round_trips(self):
+        return self.requests - self.round_trips
+
+    def add(self, factory, callback=None, retry=False):
+        """
+        :param factory: callable building the HttpRequest from a service object
+        :param callback: called with (response, exception) once the call is done
+        :param retry: True if the call is idempotent and may be sent again
+        """
+        with self.__lock:
+            self.__queue.append((factory, callback, retry))
+
+    def pending(self):
+        with self.__lock:
+            return len(self.__queue)
+
+    def flush(self, service):
+        """
+        Sends every queued call and waits for all of them
+        :return: list of exceptions of the calls that failed for good
+        """
+        with self.__lock:
+            queue, self.__queue = self.__queue, []
+        errors = []
+        attempt = 0
+        while queue:
+            retry = []
+            rate_limited = False
+            for i in range(0, len(queue), self.__limit):
+                chunk_retry, chunk_rate_limited = self.__execute(
+                    service, queue[i : i + self.__limit], errors, attempt
+                )
+                retry += chunk_retry
+                rate_limited = rate_limited or chunk_rate_limited
+            queue = retry
+            attempt += 1
+            if queue and not rate_limited:
+                # Rate limits wait for the scheduler backoff instead
+                time.sleep(min(2 ** attempt, 30) + random.random())
+        return errors
+
+    def __execute(self, service, chunk, errors, attempt):
+        """:return: (calls to send again, whether any of them was rate limited)"""
+        retry = []
+        rate_limited = []
+
+        def on_response(request_id, response, exception):
+            factory, callback, can_retry = chunk[int(request_id)]
+            if exception is not None:
+                if (
+                    can_retry
+                    and isinstance(exception, HttpError)
+                    and exception.resp.status in RETRY_STATUSES
+                    and attempt + 1 < RETRY_ATTEMPTS
+                ):
+                    retry.append((factory, callback, can_retry))
+                    if is_rate_limited(exception):
+                        rate_limited.append(request_id)
+                    return
+                errors.append(exception)
+                LOGGER.error(f"Batched Drive call failed: {exception}")
+            if callback is not None:
+                callback(response, exception)
+
+        requests = [factory(service) for factory, _, _ in chunk]
+        # Every request of the batch is built on the same service
+        account = getattr(requests[0], "account", None)
+        batch = service.new_batch_http_request(callback=on_response)
+        for request_id, request in enumerate(requests):
+            batch.add(request, request_id=str(request_id))
+        # Each call of a batch counts against the quota on its own
+        drive_scheduler.call(account, "drive.batch", batch.execute, cost=len(chunk))
+        if rate_limited:
+            drive_scheduler.back_off(account)
+        with self.__lock:
+            self.requests += len(chunk)
+            self.round_trips += 1
+        return retry, bool(rate_limited)
@@ -0,0 +1,255 @@
+import logging
+import re
+import sqlite3
+import threading
+
+from googleapiclient.errors import HttpError
+
+LOGGER = logging.getLogger(__name__)
+
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+FILE_FIELDS = "id, name, mimeType, size, modifiedTime"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    id TEXT PRIMARY KEY,
+    drive TEXT NOT NULL,
+    name TEXT NOT NULL,
+    mime_type TEXT NOT NULL,
+    size INTEGER,
+    modified TEXT
+);
+CREATE INDEX IF NOT EXISTS files_drive ON files (drive);
+CREATE TABLE IF NOT EXISTS drives (
+    drive TEXT PRIMARY KEY,
+    page_token TEXT NOT NULL
+);
+CREATE VIRTUAL TABLE IF NOT EXISTS files_fts USING fts5 (
+    name, content='files', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS files_ai AFTER INSERT ON files BEGIN
+    INSERT INTO files_fts (rowid, name) VALUES (new.rowid, new.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_ad AFTER DELETE ON files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+END;
+CREATE TRIGGER IF NOT EXISTS files_au AFTER UPDATE ON files BEGIN
+    INSERT INTO files_fts (files_fts, rowid, name) VALUES ('delete', old.rowid, old.name);
+    INSERT INTO files_fts (rowid, name) VALUES (new.rowid, new.name);
+END;
+"""
+
+UPSERT = """
+INSERT INTO files (id, drive, name, mime_type, size, modified) VALUES (?, ?, ?, ?, ?, ?)
+ON CONFLICT (id) DO UPDATE SET
+    drive = excluded.drive,
+    name = excluded.name,
+    mime_type = excluded.mime_type,
+    size = excluded.size,
+    modified = excluded.modified
+"""
+
+
+class DriveIndex:
+    """
+    On-disk SQLite FTS5 index of the files in the drives of DRIVE_ID.
+
+    A drive is listed in full once, together with a start page token of the
+    Drive changes feed. Later syncs only apply the changes since the saved
+    token. "root" stands for the files owned in My Drive.
+    """
+
+    def __init__(self, path="drive_index.db"):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__db = None
+
+    def __connect(self):
+        # Caller holds the lock
+        if self.__db is None:
+            self.__db = sqlite3.connect(self.__path, check_same_thread=False)
+            self.__db.executescript(SCHEMA)
+        return self.__db
+
+    def ready(self, drive_id):
+        """:return: True once the drive has been listed in full"""
+        return self.__page_token(drive_id) is not None
+
+    def __page_token(self, drive_id):
+        with self.__lock:
+            row = self.__connect().execute(
+                "SELECT page_token FROM drives WHERE drive = ?", (drive_id,)
+            ).fetchone()
+        return row[0] if row else None
+
+    def search(self, drive_id, search_type, file_name, limit=1000):
+        """
+        Same matching as a Drive query with one "name contains" per word
+        :param search_type: None, '-d' for folders only or '-f' for files only
+        :return: list of Drive-like file dicts, folders first, newest first
+        """
+        words = [word for word in re.split('[ ._,\\[\\]-]', file_name) if word]
+        query = (
+            "SELECT files.id, files.name, files.mime_type, files.size FROM files"
+            " JOIN files_fts ON files_fts.rowid = files.rowid WHERE files.drive = ?"
+        )
+        args = [drive_id]
+        if words:
+            query += " AND files_fts MATCH ?"
+            args.append(" AND ".join('"{}"*'.format(word.replace('"', '""')) for word in words))
+        if search_type == '-d':
+            query += " AND files.mime_type = ?"
+            args.append(FOLDER_MIME_TYPE)
+        elif search_type == '-f':
+            query += " AND files.mime_type != ?"
+            args.append(FOLDER_MIME_TYPE)
+        query += " ORDER BY files.mime_type != ?, files.modified DESC LIMIT ?"
+        args += [FOLDER_MIME_TYPE, limit]
+        with self.__lock:
+            rows = self.__connect().execute(query, args).fetchall()
+        return [
+            {"id": id, "name": name, "mimeType": mime_type, "size": size}
+            for id, name, mime_type, size in rows
+        ]
+
+    def sync(self, service, drive_ids):
+        """
+        Lists new drives in full and applies the changes feed to the others
+        """
+        with self.__lock:
+            db = self.__connect()
+            placeholders = ", ".join("?" * len(drive_ids))
+            with db:
+                db.execute(f"DELETE FROM files WHERE drive NOT IN ({placeholders})", drive_ids)
+                db.execute(f"DELETE FROM drives WHERE drive NOT IN ({placeholders})", drive_ids)
+        for drive_id in drive_ids:
+            page_token = self.__page_token(drive_id)
+            if page_token is not None:
+                try:
+                    self.__update(service, drive_id, page_token)
+                    continue
+                except HttpError as err:
+                    if err.resp.status not in [400, 404, 410]:
+                        raise err
+                    LOGGER.info(f"Changes page token of {drive_id} expired, listing it again")
+            self.__build(service, drive_id)
+
+    @staticmethod
+    def __changes_args(drive_id):
+        if drive_id == "root":
+            return {"restrictToMyDrive": True}
+        return {"driveId": drive_id, "supportsAllDrives": True, "includeItemsFromAllDrives": True}
+
+    def __write(self, drive_id, files=(), removed=(), page_token=None):
+        with self.__lock:
+            db = self.__connect()
+            with db:
+                db.executemany(
+                    "DELETE FROM files WHERE id = ? AND drive = ?",
+                    [(id, drive_id) for id in removed],
+                )
+                db.executemany(
+                    UPSERT,
+                    [
+                        (
+                            file["id"],
+                            drive_id,
+                            file["name"],
+                            file["mimeType"],
+                            int(file["size"]) if "size" in file else None,
+                            file.get("modifiedTime"),
+                        )
+                        for file in files
+                    ],
+                )
+                if page_token is not None:
+                    db.execute(
+                        "INSERT OR REPLACE INTO drives (drive, page_token) VALUES (?, ?)",
+                        (drive_id, page_token),
+                    )
+
+    def __build(self, service, drive_id):
+        # Take the token first, so changes made while listing are not lost
+        if drive_id == "root":
+            page_token = service.changes().getStartPageToken().execute()["startPageToken"]
+            args = {"q": "'me' in owners and trashed = false"}
+        else:
+            page_token = (
+                service.changes()
+                .getStartPageToken(driveId=drive_id, supportsAllDrives=True)
+                .execute()["startPageToken"]
+            )
+            args = {
+                "q": "trashed = false",
+                "corpora": "drive",
+                "driveId": drive_id,
+                "supportsAllDrives": True,
+                "includeItemsFromAllDrives": True,
+            }
+        with self.__lock:
+            db = self.__connect()
+            with db:
+                db.execute("DELETE FROM drives WHERE drive = ?", (drive_id,))
+                db.execute("DELETE FROM files WHERE drive = ?", (drive_id,))
+        count = 0
+        list_token = None
+        while True:
+            response = (
+                service.files()
+                .list(
+                    spaces="drive",
+                    pageSize=1000,
+                    fields=f"nextPageToken, files({FILE_FIELDS})",
+                    pageToken=list_token,
+                    **args,
+                )
+                .execute()
+            )
+            self.__write(drive_id, files=response.get("files", []))
+            count += len(response.get("files", []))
+            list_token = response.get("nextPageToken")
+            if list_token is None:
+                break
+        self.__write(drive_id, page_token=page_token)
+        LOGGER.info(f"Indexed {count} files of {drive_id}")
+
+    def __update(self, service, drive_id, page_token):
+        changed = 0
+        while page_token is not None:
+            response = (
+                service.changes()
+                .list(
+                    pageToken=page_token,
+                    pageSize=1000,
+                    fields=(
+                        "nextPageToken, newStartPageToken, changes(fileId, removed, "
+                        f"file({FILE_FIELDS}, trashed, ownedByMe))"
+                    ),
+                    **self.__changes_args(drive_id),
+                )
+                .execute()
+            )
+            files = []
+            removed = []
+            for change in response.get("changes", []):
+                file = change.get("file")
+                if "fileId" not in change:
+                    continue
+                if (
+                    change.get("removed")
+                    or file is None
+                    or file.get("trashed")
+                    or drive_id == "root" and not file.get("ownedByMe")
+                ):
+                    removed.append(change["fileId"])
+                else:
+                    files.append(file)
+            changed += len(files) + len(removed)
+            if "newStartPageToken" in response:
+                self.__write(drive_id, files, removed, response["newStartPageToken"])
+                page_token = None
+            else:
+                page_token = response.get("nextPageToken")
+                self.__write(drive_id, files, removed, page_token)
+        if changed:
+            LOGGER.info(f"Applied {changed} changes to the index of {drive_id}")
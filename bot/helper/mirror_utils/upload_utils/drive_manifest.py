@@ -0,0 +1,48 @@
+FOLDER_MIME_TYPE = "application/vnd.google-apps.folder"
+
+
+class DriveManifest:
+    """
+    In-memory listing of a Drive folder tree: every item with its id, name,
+    mime type, size and parent, plus the totals /count and clone report.
+    """
+
+    def __init__(self, root):
+        """
+        :param root: metadata of the top folder (id, name, mimeType)
+        """
+        self.root = root
+        # Key: item id, Value: the Drive item with an extra "parent" key
+        self.items = {}
+        # Key: folder id, Value: ids of its children in listing order
+        self.children = {root["id"]: []}
+        self.total_size = 0
+        self.file_count = 0
+        self.folder_count = 0
+
+    def add_listing(self, folder_ids, items):
+        """
+        Adds the children of folder_ids listed by one query
+        :return: ids of the subfolders not seen before
+        """
+        new_folders = []
+        for item in items:
+            for parent_id in item.get("parents", []):
+                if parent_id not in folder_ids:
+                    continue
+                self.children[parent_id].append(item["id"])
+                if item["id"] in self.items:
+                    continue
+                self.items[item["id"]] = dict(item, parent=parent_id)
+                if item["mimeType"] == FOLDER_MIME_TYPE:
+                    self.children[item["id"]] = []
+                    self.folder_count += 1
+                    new_folders.append(item["id"])
+                else:
+                    self.file_count += 1
+                    self.total_size += int(item.get("size", 0))
+        return new_folders
+
+    def listing(self, folder_id):
+        """:return: the children of a folder of the tree"""
+        return [self.items[id] for id in self.children.get(folder_id, [])]
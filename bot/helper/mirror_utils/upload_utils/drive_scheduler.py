@@ -0,0 +1,168 @@
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+
+from googleapiclient.errors import HttpError
+from googleapiclient.http import HttpRequest
+
+LOGGER = logging.getLogger(__name__)
+
+RATE_LIMIT_REASONS = ("rateLimitExceeded", "userRateLimitExceeded")
+# Times a rate limited call is sent again before its error is raised, the
+# callers still switch service accounts on errors that persist
+RATE_LIMIT_RETRIES = 3
+BACKOFF_BASE = 1
+BACKOFF_MAX = 64
+
+
+def is_rate_limited(err):
+    if not isinstance(err, HttpError):
+        return False
+    if err.resp.status == 429:
+        return True
+    if err.resp.status != 403:
+        return False
+    try:
+        reason = json.loads(err.content)["error"]["errors"][0]["reason"]
+    except (ValueError, KeyError, IndexError, TypeError):
+        return False
+    return reason in RATE_LIMIT_REASONS
+
+
+class _Bucket:
+    def __init__(self, rate):
+        self.rate = rate
+        self.tokens = rate
+        self.last = time.monotonic()
+        # Owners with calls waiting, in the order they get their next token
+        self.turns = deque()
+        self.waiting = {}
+
+    def refill(self, now):
+        self.tokens = min(self.tokens + (now - self.last) * self.rate, self.rate)
+        self.last = now
+
+
+class DriveScheduler:
+    """
+    Paces every Drive API call of the bot.
+
+    Each service account and API method gets a token bucket of rate calls
+    per second, or of its own rate in method_rates. Calls waiting on a bucket get their tokens in turns by
+    owner, normally the helper of one task, so a task with many workers
+    does not starve the others. A 403 or 429 rate limit error makes every
+    call of that account wait for one shared, jittered and growing backoff.
+    """
+
+    def __init__(self, rate, method_rates=None):
+        self.__rate = rate
+        self.__method_rates = method_rates or {}
+        self.__cond = threading.Condition()
+        self.__buckets = {}
+        self.__backoff_until = {}
+        self.__failures = {}
+        self.__local = threading.local()
+
+    def set_owner(self, owner):
+        """Makes the calls of this thread count for owner"""
+        self.__local.owner = owner
+
+    def __wait_time(self, account, bucket, owner, cost, now):
+        # Caller holds the condition. :return: 0 once the call may be sent
+        backoff = self.__backoff_until.get(account, 0) - now
+        if backoff > 0:
+            return backoff
+        if bucket is None:
+            return 0
+        if bucket.turns[0] != owner:
+            return 1
+        bucket.refill(now)
+        if bucket.tokens >= min(cost, bucket.rate):
+            return 0
+        return (min(cost, bucket.rate) - bucket.tokens) / bucket.rate
+
+    def acquire(self, account, method, cost=1):
+        owner = getattr(self.__local, "owner", None)
+        rate = self.__method_rates.get(method, self.__rate)
+        with self.__cond:
+            bucket = None
+            if rate > 0:
+                bucket = self.__buckets.get((account, method))
+                if bucket is None:
+                    bucket = self.__buckets[(account, method)] = _Bucket(rate)
+                if owner not in bucket.waiting:
+                    bucket.turns.append(owner)
+                bucket.waiting[owner] = bucket.waiting.get(owner, 0) + 1
+            while True:
+                delay = self.__wait_time(account, bucket, owner, cost, time.monotonic())
+                if delay <= 0:
+                    break
+                self.__cond.wait(delay)
+            if bucket is not None:
+                # A batch may cost more than a full bucket, it then leaves
+                # the bucket in debt instead of waiting forever
+                bucket.tokens -= cost
+                bucket.turns.popleft()
+                bucket.waiting[owner] -= 1
+                if bucket.waiting[owner] > 0:
+                    bucket.turns.append(owner)
+                else:
+                    del bucket.waiting[owner]
+                self.__cond.notify_all()
+
+    def back_off(self, account):
+        with self.__cond:
+            failures = self.__failures.get(account, 0) + 1
+            self.__failures[account] = failures
+            delay = random.uniform(0, min(BACKOFF_BASE * 2 ** failures, BACKOFF_MAX))
+            until = time.monotonic() + delay
+            if until > self.__backoff_until.get(account, 0):
+                self.__backoff_until[account] = until
+        LOGGER.info(f"Drive rate limit hit by {account}, pausing its calls for {round(delay, 1)}s")
+
+    def recover(self, account):
+        with self.__cond:
+            self.__failures.pop(account, None)
+
+    def call(self, account, method, func, cost=1):
+        """Runs func, a Drive call, when the scheduler allows it"""
+        attempt = 0
+        while True:
+            self.acquire(account, method, cost)
+            try:
+                result = func()
+            except HttpError as err:
+                if not is_rate_limited(err) or attempt >= RATE_LIMIT_RETRIES:
+                    raise err
+                attempt += 1
+                self.back_off(account)
+                continue
+            self.recover(account)
+            return result
+
+    def queue_depth(self):
+        """:return: number of calls waiting for a token"""
+        with self.__cond:
+            return sum(
+                count for bucket in self.__buckets.values() for count in bucket.waiting.values()
+            )
+
+
+class ScheduledHttpRequest(HttpRequest):
+    """HttpRequest whose execute goes through a DriveScheduler"""
+
+    def __init__(self, *args, scheduler=None, account=None, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.scheduler = scheduler
+        self.account = account
+
+    def execute(self, http=None, num_retries=0):
+        parent = super()
+        return self.scheduler.call(
+            self.account,
+            self.methodId,
+            lambda: parent.execute(http=http, num_retries=num_retries),
+        )
@@ -0,0 +1,77 @@
+import functools
+import json
+import logging
+import threading
+
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build, build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+
+from bot import DRIVE_API_RATE, DRIVE_BATCH_RATE
+from bot.helper.ext_utils.http_transport import thread_http
+from bot.helper.mirror_utils.upload_utils.drive_scheduler import DriveScheduler, ScheduledHttpRequest
+
+LOGGER = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+# Key: credential source (token file or service account file)
+# Value: credentials shared by every thread, so a refreshed token is reused
+_credentials = {}
+_discovery_doc = None
+# Per thread cache of built services, as httplib2 transports are not thread-safe.
+# The services of one thread share its transport and so its connections.
+_local = threading.local()
+# Seconds a socket may stall before the call fails, so a dead link does not hang forever
+HTTP_TIMEOUT = 120
+# Every request built by a service executes through this scheduler. Batches
+# are charged a call per request they carry, against a budget of their own
+# close to Drive's per user quota of 12,000 queries a minute: at
+# DRIVE_API_RATE a 100 call batch would wait 10s for the next one.
+drive_scheduler = DriveScheduler(DRIVE_API_RATE, {"drive.batch": DRIVE_BATCH_RATE})
+
+
+def _get_credentials(key, load_credentials):
+    with _lock:
+        credentials = _credentials.get(key)
+        if credentials is None:
+            LOGGER.info(f"Loading credentials from {key}")
+            credentials = _credentials[key] = load_credentials()
+        return credentials
+
+
+def _get_discovery_doc(credentials):
+    global _discovery_doc
+    with _lock:
+        if _discovery_doc is None:
+            # Parse the document once instead of on every build
+            static_doc = get_static_doc("drive", "v3")
+            if static_doc is not None:
+                _discovery_doc = json.loads(static_doc)
+        if _discovery_doc is None:
+            service = build("drive", "v3", credentials=credentials, cache_discovery=False)
+            _discovery_doc = service._rootDesc
+        return _discovery_doc
+
+
+def get_service(key, load_credentials):
+    """
+    Returns the Drive service for a credential source, built once per thread.
+    :param key: credential source, e.g. token.pickle or accounts/0.json
+    :param load_credentials: called once per process to load the credentials
+    """
+    services = getattr(_local, "services", None)
+    if services is None:
+        services = _local.services = {}
+    service = services.get(key)
+    if service is None:
+        credentials = _get_credentials(key, load_credentials)
+        http = AuthorizedHttp(credentials, http=thread_http(HTTP_TIMEOUT))
+        service = services[key] = build_from_document(
+            _get_discovery_doc(credentials),
+            http=http,
+            requestBuilder=functools.partial(
+                ScheduledHttpRequest, scheduler=drive_scheduler, account=key
+            ),
+        )
+    return service
+
@@ -1,26 +1,29 @@
+import hashlib
 import io
 import json
 import logging
 import os
 import pickle
 import re
+import socket
+import threading
 import urllib.parse as urlparse
+from concurrent.futures import ThreadPoolExecutor, as_completed, wait
+from collections import deque
 from urllib.parse import parse_qs
 
 import requests
 from google.auth.transport.requests import Request
 from google.oauth2 import service_account
 from google_auth_oauthlib.flow import InstalledAppFlow
-from googleapiclient.discovery import build
 from googleapiclient.errors import HttpError
 from googleapiclient.http import MediaFileUpload, MediaIoBaseDownload
 from telegram import InlineKeyboardMarkup
-from telegraph import Telegraph
 from tenacity import (
     RetryError,
     before_log,
     retry,
-    retry_if_exception_type,
+    retry_if_exception,
     stop_after_attempt,
     wait_exponential,
 )
@@ -33,27 +36,95 @@ from bot import (
     BUTTON_FOUR_URL,
     BUTTON_THREE_NAME,
     BUTTON_THREE_URL,
+    CLONE_WORKERS,
+    CONTENT_INDEX_INTERVAL,
+    DOWNLOAD_CONNECTIONS,
     DOWNLOAD_DIR,
+    DOWNLOAD_WORKERS,
     INDEX_URL,
     IS_TEAM_DRIVE,
+    METADATA_CACHE_SIZE,
+    METADATA_CACHE_TTL,
+    SEARCH_INDEX,
+    SEARCH_INDEX_INTERVAL,
+    SKIP_DUPLICATE_UPLOADS,
     SHORTENER,
+    STREAM_BUFFER_SIZE,
+    SERVICE_ACCOUNT_COOLDOWN,
     SHORTENER_API,
+    UPLOAD_WORKERS,
     USE_SERVICE_ACCOUNTS,
     download_dict,
     parent_id,
-    telegraph_token,
     VIEW_LINK,
 )
-from bot.helper.ext_utils.bot_utils import get_readable_file_size, setInterval, time
-from bot.helper.ext_utils.fs_utils import get_mime_type, get_path_size
+from bot.helper.ext_utils.bot_utils import get_readable_file_size, new_thread, setInterval, time
+from bot.helper.ext_utils.throughput import ThroughputMeter
+from bot.helper.ext_utils.http_transport import session
+from bot.helper.ext_utils.fs_utils import get_mime_type, get_path_size, prefetch_mime_types
+from bot.helper.ext_utils.shortener import shortener
+from bot.helper.ext_utils.telegraph_helper import telegraph
+from bot.helper.mirror_utils.upload_utils.chunk_sizer import CHUNK_ALIGN, ChunkSizer
+from bot.helper.mirror_utils.upload_utils.clone_journal import CloneJournal
+from bot.helper.mirror_utils.upload_utils.content_index import ContentIndex
+from bot.helper.mirror_utils.upload_utils.drive_batch import BATCH_LIMIT, RETRY_STATUSES, DriveBatch
+from bot.helper.mirror_utils.upload_utils.drive_index import DriveIndex
+from bot.helper.mirror_utils.upload_utils.drive_manifest import DriveManifest
+from bot.helper.mirror_utils.upload_utils.drive_scheduler import is_rate_limited
+from bot.helper.mirror_utils.upload_utils.drive_service import drive_scheduler, get_service
+from bot.helper.mirror_utils.upload_utils.metadata_cache import MetadataCache
+from bot.helper.mirror_utils.upload_utils.sa_pool import ServiceAccountPool
+from bot.helper.mirror_utils.upload_utils.stream_upload import StreamMediaUpload
+from bot.helper.mirror_utils.upload_utils.upload_journal import UploadJournal
 from bot.helper.telegram_helper import button_build
 
 LOGGER = logging.getLogger(__name__)
 logging.getLogger("googleapiclient.discovery").setLevel(logging.ERROR)
-SERVICE_ACCOUNT_INDEX = 0
+sa_pool = ServiceAccountPool(cooldown=SERVICE_ACCOUNT_COOLDOWN)
+upload_journal = UploadJournal()
+metadata_cache = MetadataCache(max_entries=METADATA_CACHE_SIZE, ttl=METADATA_CACHE_TTL)
+drive_index = DriveIndex()
+content_index = ContentIndex()
+clone_journal = CloneJournal()
+# Long-lived, so its threads keep their Drive services between searches
+search_executor = ThreadPoolExecutor(max_workers=max(min(len(DRIVE_ID), 16), 1))
 TELEGRAPHLIMIT = 80
+# Timed out chunks in a row before an upload gives up
+MAX_CHUNK_TIMEOUTS = 5
+# Byte range fetched by one request of a multi-connection download
+RANGE_SIZE = 32 * 1024 * 1024
+# Bytes of a range fetched and written at a time, what a range holds in memory
+RANGE_PIECE = 8 * 1024 * 1024
+RANGE_RETRIES = 5
+# Seconds a multi-drive search waits for the slowest drive
+SEARCH_DEADLINE = 15
+# Folders listed by one query of a tree traversal, and queries run at once
+PARENTS_PER_QUERY = 50
+TRAVERSE_WORKERS = 8
+# Delete batches sent at once
+DELETE_WORKERS = 8
 SIZE_UNITS = ['B', 'KB', 'MB', 'GB', 'TB', 'PB']
 
+
+def _should_retry(err):
+    # Rate limits were retried by the scheduler already, after a backoff
+    # shared by every task, retrying them here again only adds to the storm
+    return isinstance(err, HttpError) and not is_rate_limited(err)
+
+
+def _is_not_found(err):
+    return isinstance(err, HttpError) and err.resp.status == 404
+
+
+def _error_reason(err):
+    if isinstance(err, HttpError):
+        try:
+            return json.loads(err.content)["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            pass
+    return str(err)
+
+
 class GoogleDriveHelper:
     def __init__(self, name=None, listener=None):
         self.__G_DRIVE_TOKEN_FILE = "token.pickle"
@@ -65,20 +136,25 @@ class GoogleDriveHelper:
         self.__G_DRIVE_BASE_DOWNLOAD_URL = "https://drive.google.com/uc?id={}&export=download"
         self.__G_DRIVE_DIR_BASE_DOWNLOAD_URL = "https://drive.google.com/drive/folders/{}"
         self.__listener = listener
+        self.__local = threading.local()
+        self.__lock = threading.Lock()
+        self.__batch = None
+        # Ids whose batched permission grant failed, granted again one by one
+        self.__failed_grants = []
+        # Clone journal job of the folder clone running on this helper
+        self.__clone_job = None
+        self.__quota_exhausted = False
+        self.__sa_leases = sa_pool.lease_tracker(self)
         self.__service = self.authorize()
-        self._file_uploaded_bytes = 0
-        self._file_downloaded_bytes = 0
         self.uploaded_bytes = 0
         self.downloaded_bytes = 0
-        self.start_time = 0
-        self.total_time = 0
-        self.dtotal_time = 0
+        # Rate of the transfer running on this helper, restarted by
+        # upload, download and clone
+        self.meter = ThroughputMeter()
         self.is_uploading = False
         self.is_downloading = False
         self.is_cloning = False
         self.is_cancelled = False
-        self.status = None
-        self.dstatus = None
         self.updater = None
         self.name = name
         self.update_interval = 3
@@ -88,30 +164,30 @@ class GoogleDriveHelper:
         self.total_files = 0
         self.total_folders = 0
         self.transferred_size = 0
-        self.sa_count = 0
+        # Tree listed by clonehelper, reused by clone and download
+        self.manifest = None
+
+    @property
+    def __service(self):
+        # googleapiclient services are not thread-safe, so every thread
+        # working for this helper gets a service object of its own
+        # The calls that follow count for this helper in the scheduler turns
+        drive_scheduler.set_owner(id(self))
+        service = getattr(self.__local, "service", None)
+        if service is None:
+            service = self.__local.service = self.authorize()
+        return service
+
+    @__service.setter
+    def __service(self, service):
+        self.__local.service = service
 
     def speed(self):
         """
-        It calculates the average upload speed and returns it in bytes/seconds unit
-        :return: Upload speed in bytes/second
+        :return: Speed of the running upload, download or clone in bytes/second
         """
-        try:
-            return self.uploaded_bytes / self.total_time
-        except ZeroDivisionError:
-            return 0
+        return self.meter.speed()
 
-    def dspeed(self):
-        try:
-            return self.downloaded_bytes / self.dtotal_time
-        except ZeroDivisionError:
-            return 0
-
-    def cspeed(self):
-        try:
-            return self.transferred_size / int(time.time() - self.start_time)
-        except ZeroDivisionError:
-            return 0        
-    
     @staticmethod
     def getIdFromUrl(link: str):
         if "folders" in link or "file" in link:
@@ -126,7 +202,7 @@ class GoogleDriveHelper:
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(HttpError),
+        retry=retry_if_exception(_should_retry),
         before=before_log(LOGGER, logging.DEBUG),
     )
 
@@ -163,17 +239,17 @@ class GoogleDriveHelper:
         return rtnlist           
 
     def _on_upload_progress(self):
-        if self.status is not None:
-            chunk_size = (
-                self.status.total_size * self.status.progress()
-                - self._file_uploaded_bytes
-            )
-            self._file_uploaded_bytes = self.status.total_size * self.status.progress()
+        if self.uploaded_bytes > 0:
             LOGGER.debug(
-                f"Uploading {self.name}, chunk size: {get_readable_file_size(chunk_size)}"
+                f"Uploading {self.name}, uploaded: {get_readable_file_size(self.uploaded_bytes)}"
             )
-            self.uploaded_bytes += chunk_size
-            self.total_time += self.update_interval
+
+    def __add_uploaded_bytes(self, size, transferred=True):
+        """transferred is False for bytes counted without sending them now"""
+        with self.__lock:
+            self.uploaded_bytes += size
+        if transferred:
+            self.meter.add(size)
 
     def __upload_empty_file(self, path, file_name, mime_type, parent_id=None):
         media_body = MediaFileUpload(path, mimetype=mime_type, resumable=False)
@@ -190,42 +266,124 @@ class GoogleDriveHelper:
             .execute()
         )
 
-    def switchServiceAccount(self):
-        global SERVICE_ACCOUNT_INDEX
-        service_account_count = len(os.listdir("accounts"))
-        if SERVICE_ACCOUNT_INDEX == service_account_count - 1:
+    def switchServiceAccount(self, reason=None):
+        sa_index = getattr(self.__local, "sa_index", None)
+        if sa_index is not None and reason is not None:
+            sa_pool.report_error(sa_index, reason)
+        new_index = sa_pool.acquire(exclude=(sa_index,))
+        if new_index is None:
+            LOGGER.info("No healthy service account left")
             return False
-        SERVICE_ACCOUNT_INDEX += 1
-        LOGGER.info(f"Switching to {SERVICE_ACCOUNT_INDEX}.json service account")
-        self.__service = self.authorize()
+        if sa_index is not None:
+            with self.__lock:
+                leased = sa_index in self.__sa_leases
+                if leased:
+                    self.__sa_leases.remove(sa_index)
+            if leased:
+                sa_pool.release(sa_index)
+        LOGGER.info(f"Switching to {new_index}.json service account")
+        self.__service = self.authorize(new_index)
         return True
 
+    def __release_service_accounts(self):
+        # Called once the task of this helper ends. The finalizer of the
+        # lease tracker only catches helpers that are never released.
+        with self.__lock:
+            leases = list(self.__sa_leases)
+            self.__sa_leases.clear()
+            # Later calls lease an account again
+            self.__local = threading.local()
+        sa_pool.release_all(leases)
+
+    def __add_sa_usage(self, size):
+        sa_index = getattr(self.__local, "sa_index", None)
+        if USE_SERVICE_ACCOUNTS and sa_index is not None:
+            sa_pool.add_usage(sa_index, size)
+
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(HttpError),
+        retry=retry_if_exception(_should_retry),
         before=before_log(LOGGER, logging.DEBUG),
     )
     def __set_permission(self, drive_id):
+        return self.__permission_request(self.__service, drive_id).execute()
+
+    @staticmethod
+    def __permission_request(service, drive_id):
         permissions = {
             "role": "reader",
             "type": "anyone",
             "value": None,
             "withLink": True,
         }
-        return (
-            self.__service.permissions()
-            .create(supportsTeamDrives=True, fileId=drive_id, body=permissions)
-            .execute()
+        return service.permissions().create(
+            supportsTeamDrives=True, fileId=drive_id, body=permissions
+        )
+
+    def __grant_permission(self, drive_id):
+        # Folder uploads and clones queue their grants and send them in batches
+        if self.__batch is None:
+            self.__set_permission(drive_id)
+        else:
+            self.__batch.add(
+                lambda service: self.__permission_request(service, drive_id),
+                lambda response, exception: self.__on_grant(drive_id, exception),
+                retry=True,
+            )
+
+    def __on_grant(self, drive_id, exception):
+        if exception is not None:
+            with self.__lock:
+                self.__failed_grants.append(drive_id)
+
+    def __retry_failed_grants(self):
+        # An item left without its grant would silently stay private, so a
+        # grant that fails here again fails the task
+        with self.__lock:
+            failed, self.__failed_grants = self.__failed_grants, []
+        for drive_id in failed:
+            LOGGER.info(f"Granting permission again: {drive_id}")
+            self.__set_permission(drive_id)
+
+    def __flush_batch(self):
+        batch, self.__batch = self.__batch, None
+        if batch is None:
+            return
+        batch.flush(self.__service)
+        LOGGER.info(
+            f"Drive batch: {batch.requests} calls in {batch.round_trips} round-trips, "
+            f"saved {batch.saved_round_trips} round-trips: {self.name}"
         )
+        # Only grants are queued on this batch, their errors are retried
+        self.__retry_failed_grants()
 
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(HttpError),
+        retry=retry_if_exception(_should_retry),
         before=before_log(LOGGER, logging.DEBUG),
     )
-    def upload_file(self, file_path, file_name, mime_type, parent_id):
+    def upload_file(self, file_path, file_name, mime_type, parent_id, resumable=False):
+        """
+        :param resumable: journal the upload session, so an upload of the same
+            file after a restart resumes it. Only single file uploads can
+            match, a folder upload creates a new parent folder every time.
+        """
+        journal_key = None
+        if resumable and os.path.getsize(file_path) > 0:
+            journal_key = upload_journal.key(file_path, file_name, parent_id)
+            if not upload_journal.claim(journal_key):
+                # Two sessions for one journal entry would upload into each other
+                LOGGER.info(f"Same file is being uploaded by another task, not journaling it: {file_name}")
+                journal_key = None
+        try:
+            return self.__upload_file(file_path, file_name, mime_type, parent_id, journal_key)
+        finally:
+            if journal_key is not None:
+                upload_journal.release(journal_key)
+
+    def __upload_file(self, file_path, file_name, mime_type, parent_id, journal_key):
         # File body description
         file_metadata = {
             "name": file_name,
@@ -248,60 +406,129 @@ class GoogleDriveHelper:
                 )
                 .execute()
             )
+            metadata_cache.invalidate_listing(parent_id)
             if not IS_TEAM_DRIVE:
-                self.__set_permission(response["id"])
-
-            drive_file = (
-                self.__service.files()
-                .get(supportsTeamDrives=True, fileId=response["id"])
-                .execute()
-            )
-            download_url = self.__G_DRIVE_BASE_DOWNLOAD_URL.format(drive_file.get("id"))
-            return download_url
+                self.__grant_permission(response["id"])
+            return self.__G_DRIVE_BASE_DOWNLOAD_URL.format(response["id"])
         media_body = MediaFileUpload(
-            file_path, mimetype=mime_type, resumable=True, chunksize=50 * 1024 * 1024
+            file_path, mimetype=mime_type, resumable=True, chunksize=CHUNK_ALIGN
         )
 
         # Insert a file
         drive_file = self.__service.files().create(
             supportsTeamDrives=True, body=file_metadata, media_body=media_body
         )
+        sizer = ChunkSizer(urlparse.urlparse(drive_file.uri).netloc)
+        timeouts = 0
         response = None
+        file_uploaded_bytes = 0
+        entry = upload_journal.get(journal_key) if journal_key is not None else None
+        if entry is not None:
+            file_uploaded_bytes, response = self.__resume_session(
+                drive_file, entry["uri"], os.path.getsize(file_path)
+            )
+            if file_uploaded_bytes is None:
+                LOGGER.info(f"Upload session expired, starting over: {file_name}")
+                upload_journal.remove(journal_key)
+                entry = None
+                file_uploaded_bytes = 0
+            else:
+                LOGGER.info(f"Resuming upload at {get_readable_file_size(file_uploaded_bytes)}: {file_name}")
+                self.__add_uploaded_bytes(file_uploaded_bytes, transferred=False)
         while response is None:
             if self.is_cancelled:
-                break
+                upload_journal.remove(journal_key)
+                return
+            # MediaFileUpload reads its chunk size on every next_chunk call
+            media_body._chunksize = sizer.chunk_size()
+            chunk_start = time.time()
             try:
-                self.status, response = drive_file.next_chunk()
+                status, response = drive_file.next_chunk()
+            except socket.timeout as err:
+                sizer.record_error()
+                timeouts += 1
+                if drive_file.resumable_uri is None or timeouts > MAX_CHUNK_TIMEOUTS:
+                    raise err
+                LOGGER.info(f"Chunk timed out, retrying with {get_readable_file_size(sizer.chunk_size())}: {file_name}")
+                # Ask Drive where to continue, part of the chunk may have arrived
+                file_progress, response = self.__resume_session(
+                    drive_file, drive_file.resumable_uri, os.path.getsize(file_path)
+                )
+                if file_progress is None:
+                    raise err
+                continue
             except HttpError as err:
+                sizer.record_error()
                 if err.resp.get('content-type', '').startswith('application/json'):
                     reason = json.loads(err.content).get('error').get('errors')[0].get('reason')
+                    # Counted again by the retry, which resumes or restarts the session
+                    self.__add_uploaded_bytes(-file_uploaded_bytes)
                     if reason not in [
                         'userRateLimitExceeded',
                         'dailyLimitExceeded',
                     ]:
                         raise err
-                    if USE_SERVICE_ACCOUNTS:
-                        self.switchServiceAccount()
+                    # The session belongs to the account that ran out of quota
+                    upload_journal.remove(journal_key)
+                    if USE_SERVICE_ACCOUNTS and self.switchServiceAccount(reason):
                         LOGGER.info(f"Got: {reason}, Trying Again.")
-                        return self.upload_file(file_path, file_name, mime_type, parent_id)
+                        # Still holds the journal key, for the session of the next account
+                        return self.__upload_file(file_path, file_name, mime_type, parent_id, journal_key)
                     else:
                         self.is_cancelled = True
                         LOGGER.info(f"Got: {reason}")
                         raise err
+                continue
+            timeouts = 0
+            if status is not None:
+                sizer.record(status.resumable_progress - file_uploaded_bytes, time.time() - chunk_start)
+                if entry is None and journal_key is not None:
+                    # Journal the session once Drive has confirmed its first chunk
+                    entry = upload_journal.add(
+                        journal_key, drive_file.resumable_uri, file_path, parent_id
+                    )
+                self.__add_uploaded_bytes(status.resumable_progress - file_uploaded_bytes)
+                file_uploaded_bytes = status.resumable_progress
             if self.is_cancelled:
+                upload_journal.remove(journal_key)
                 return
-        self._file_uploaded_bytes = 0
+        upload_journal.remove(journal_key)
+        metadata_cache.invalidate_listing(parent_id)
+        # The last chunk is acknowledged with the file resource instead of a status
+        self.__add_uploaded_bytes(os.path.getsize(file_path) - file_uploaded_bytes)
+        self.__add_sa_usage(os.path.getsize(file_path))
         # Insert new permissions
         if not IS_TEAM_DRIVE:
-            self.__set_permission(response["id"])
-        # Define file instance and get url for download
-        drive_file = (
-            self.__service.files()
-            .get(supportsTeamDrives=True, fileId=response["id"])
-            .execute()
-        )
-        download_url = self.__G_DRIVE_BASE_DOWNLOAD_URL.format(drive_file.get("id"))
-        return download_url
+            self.__grant_permission(response["id"])
+        # The create response already carries the id of the new file
+        return self.__G_DRIVE_BASE_DOWNLOAD_URL.format(response["id"])
+
+    @staticmethod
+    def __resume_session(drive_file, uri, size):
+        """
+        Asks Drive how much of a journaled session it already has
+        :return: (confirmed offset, file resource if the upload had finished),
+            offset is None if the session can not be resumed
+        """
+        try:
+            resp, content = drive_file.http.request(
+                uri,
+                "PUT",
+                headers={"Content-Length": "0", "Content-Range": f"bytes */{size}"},
+            )
+        except Exception as e:
+            LOGGER.error(f"Unable to query upload session: {e}")
+            return None, None
+        if resp.status in [200, 201]:
+            return size, json.loads(content)
+        if resp.status != 308:
+            return None, None
+        drive_file.resumable_uri = uri
+        if "range" in resp:
+            drive_file.resumable_progress = int(resp["range"].split("-")[1]) + 1
+        else:
+            drive_file.resumable_progress = 0
+        return drive_file.resumable_progress, None
 
     def deletefile(self, link: str):
         try:
@@ -309,28 +536,116 @@ class GoogleDriveHelper:
         except (KeyError, IndexError):
             msg = "Google drive ID could not be found in the provided link"
             return msg
-        msg = ""
-        try:
-            res = (
-                self.__service.files()
-                .delete(fileId=file_id, supportsTeamDrives=IS_TEAM_DRIVE)
-                .execute()
+        failed = self.delete_files([file_id])
+        if not failed:
+            return "Successfully deleted"
+        if "File not found" in failed.get(file_id, ""):
+            return "No such file exist"
+        LOGGER.error(f"Could not delete {len(failed)} items of {file_id}: {failed}")
+        return "Something went wrong check log"
+
+    def delete_files(self, file_ids):
+        """
+        Deletes files and whole folders through batched calls. Drive deletes
+        the content of a folder with it, a folder it refuses to delete at
+        once is emptied bottom-up instead.
+        :return: dict of the ids that could not be deleted to the reason
+        """
+        file_ids = list(dict.fromkeys(file_ids))
+        failed = self.__delete_batched(file_ids)
+        for file_id, err in list(failed.items()):
+            if _is_not_found(err):
+                continue
+            try:
+                meta = self.getFileMetadata(file_id)
+            except Exception:
+                continue
+            if meta.get("mimeType") != self.__G_DRIVE_DIR_MIME_TYPE:
+                continue
+            LOGGER.info(f"Deleting folder {file_id} bottom-up after: {_error_reason(err)}")
+            del failed[file_id]
+            failed.update(self.__delete_tree(meta))
+        return {file_id: _error_reason(err) for file_id, err in failed.items()}
+
+    def __delete_tree(self, root):
+        """
+        Deletes the files of a folder tree, then its folders deepest first
+        :return: dict of the ids that could not be deleted to the error
+        """
+        manifest = self.build_manifest(root)
+        depths = {root["id"]: 0}
+        levels = [[root["id"]]]
+        files = []
+        # Listed breadth-first, so a parent always comes before its children
+        for item_id, item in manifest.items.items():
+            if item["mimeType"] != self.__G_DRIVE_DIR_MIME_TYPE:
+                files.append(item_id)
+                continue
+            depth = depths[item_id] = depths[item["parent"]] + 1
+            if depth == len(levels):
+                levels.append([])
+            levels[depth].append(item_id)
+        failed = self.__delete_batched(files)
+        for level in reversed(levels):
+            failed.update(self.__delete_batched(level))
+        # Items gone already, with a folder deleted by someone else
+        return {item_id: err for item_id, err in failed.items() if not _is_not_found(err)}
+
+    def __delete_batched(self, file_ids):
+        """
+        Deletes ids through one batch per BATCH_LIMIT ids, with up to
+        DELETE_WORKERS batches in flight
+        :return: dict of the ids that could not be deleted to the error
+        """
+        failed = {}
+        deleted = set()
+
+        def factory(file_id):
+            return lambda service: service.files().delete(
+                fileId=file_id, supportsAllDrives=True
             )
-            msg = "Successfully deleted"
-        except HttpError as err:
-            LOGGER.error(str(err))
-            if "File not found" in str(err):
-                msg = "No such file exist"
-            else:
-                msg = "Something went wrong check log"
-        finally:
-            return msg
+
+        def callback(file_id):
+            def on_response(response, exception):
+                if exception is not None:
+                    failed[file_id] = exception
+                else:
+                    deleted.add(file_id)
+            return on_response
+
+        def flush(chunk):
+            batch = DriveBatch()
+            for file_id in chunk:
+                batch.add(factory(file_id), callback(file_id), retry=True)
+            try:
+                batch.flush(self.__service)
+            except Exception as e:
+                LOGGER.error(f"Delete batch failed: {e}")
+                for file_id in chunk:
+                    if file_id not in deleted:
+                        failed.setdefault(file_id, e)
+
+        chunks = [file_ids[i : i + BATCH_LIMIT] for i in range(0, len(file_ids), BATCH_LIMIT)]
+        if len(chunks) > 1:
+            with ThreadPoolExecutor(max_workers=DELETE_WORKERS) as executor:
+                list(executor.map(flush, chunks))
+        elif chunks:
+            flush(chunks[0])
+        metadata_cache.invalidate_many(deleted)
+        if file_ids:
+            LOGGER.info(f"Deleted {len(deleted)} of {len(file_ids)} items in {len(chunks)} batches")
+        return failed
 
     def upload(self, file_name: str):
+        try:
+            return self.__upload(file_name)
+        finally:
+            self.__release_service_accounts()
+
+    def __upload(self, file_name: str):
         self.is_downloading = False
         self.is_uploading = True
-        if USE_SERVICE_ACCOUNTS:
-            self.service_account_count = len(os.listdir("accounts"))
+        self.meter = ThroughputMeter()
         self.__listener.onUploadStarted()
         file_dir = f"{DOWNLOAD_DIR}{self.__listener.message.message_id}"
         file_path = f"{file_dir}/{file_name}"
@@ -340,7 +655,7 @@ class GoogleDriveHelper:
         if os.path.isfile(file_path):
             try:
                 mime_type = get_mime_type(file_path)
-                link = self.upload_file(file_path, file_name, mime_type, parent_id)
+                link = self.upload_file(file_path, file_name, mime_type, parent_id, resumable=True)
                 if self.is_cancelled:
                     return
                 if link is None:
@@ -360,6 +675,8 @@ class GoogleDriveHelper:
                     return
         else:
             try:
+                prefetch_mime_types(file_path)
+                self.__batch = DriveBatch()
                 dir_id = self.create_directory(
                     os.path.basename(os.path.abspath(file_name)), parent_id
                 )
@@ -372,6 +689,7 @@ class GoogleDriveHelper:
                     msg = self.deletefile(link)
                     LOGGER.info(f"{msg}")
                     return
+                self.__flush_batch()
                 LOGGER.info("Uploaded To G-Drive: " + file_name)
             except Exception as e:
                 if isinstance(e, RetryError):
@@ -392,33 +710,142 @@ class GoogleDriveHelper:
         self.__listener.onUploadComplete(link, size, files, folders, typ)
         return link
 
+    def upload_stream(self, response, file_name, mime_type, size=None, reopen=None):
+        """
+        Uploads the body of a streamed requests response while it downloads
+        :param size: Content-Length of the response, None if not known
+        :param reopen: callable returning the response again from a byte
+            offset, None if the source can not resume
+        """
+        try:
+            return self.__upload_stream(response, file_name, mime_type, size, reopen)
+        finally:
+            self.__release_service_accounts()
+
+    def __upload_stream(self, response, file_name, mime_type, size=None, reopen=None):
+        self.is_downloading = False
+        self.is_uploading = True
+        self.meter = ThroughputMeter()
+        self.__listener.onUploadStarted()
+        LOGGER.info(f"Streaming To G-Drive: {file_name}")
+        self.updater = setInterval(self.update_interval, self._on_upload_progress)
+        media_body = StreamMediaUpload(
+            response, mime_type, size, chunksize=CHUNK_ALIGN, buffer_size=STREAM_BUFFER_SIZE, reopen=reopen
+        )
+        try:
+            link = self.__upload_stream_file(media_body, file_name, mime_type, parent_id)
+            if self.is_cancelled:
+                return
+            if link is None:
+                raise Exception("Upload has been manually cancelled")
+        except Exception as e:
+            LOGGER.error(e)
+            self.__listener.onUploadError(str(e))
+            return
+        finally:
+            media_body.close()
+            self.updater.cancel()
+            if self.is_cancelled:
+                return
+        LOGGER.info("Uploaded To G-Drive: " + file_name)
+        size = get_readable_file_size(media_body.received)
+        self.__listener.onUploadComplete(link, size, self.total_files, self.total_folders, self.typee)
+        return link
+
+    def __upload_stream_file(self, media_body, file_name, mime_type, parent_id):
+        # Without @retry, and without the upload journal: a stream can not be
+        # read again, so only the bytes still buffered can be sent again
+        file_metadata = {
+            "name": file_name,
+            "description": "Uploaded Using Harsh MirrorBot",
+            "mimeType": mime_type,
+        }
+        self.typee = mime_type
+        if parent_id is not None:
+            file_metadata["parents"] = [parent_id]
+        drive_file = self.__service.files().create(
+            supportsTeamDrives=True, body=file_metadata, media_body=media_body
+        )
+        sizer = ChunkSizer(urlparse.urlparse(drive_file.uri).netloc)
+        # The chunk waiting for Drive is held in memory besides the buffer
+        max_chunk = max(STREAM_BUFFER_SIZE // CHUNK_ALIGN * CHUNK_ALIGN, CHUNK_ALIGN)
+        errors = 0
+        response = None
+        file_uploaded_bytes = 0
+        while response is None:
+            if self.is_cancelled:
+                return
+            media_body._chunksize = min(sizer.chunk_size(), max_chunk)
+            # One byte past the chunk tells whether the chunk is the last one
+            media_body.fill(drive_file.resumable_progress + media_body.chunksize() + 1)
+            chunk_start = time.time()
+            try:
+                status, response = drive_file.next_chunk()
+            except (socket.timeout, HttpError) as err:
+                sizer.record_error()
+                errors += 1
+                if isinstance(err, HttpError) and err.resp.status < 500 or errors > MAX_CHUNK_TIMEOUTS:
+                    raise err
+                if drive_file.resumable_uri is None:
+                    raise err
+                LOGGER.info(f"Chunk failed, retrying with {get_readable_file_size(sizer.chunk_size())}: {file_name}")
+                file_progress, response = self.__resume_session(
+                    drive_file, drive_file.resumable_uri, "*"
+                )
+                if file_progress is None:
+                    raise err
+                continue
+            errors = 0
+            if status is not None:
+                sizer.record(status.resumable_progress - file_uploaded_bytes, time.time() - chunk_start)
+                self.__add_uploaded_bytes(status.resumable_progress - file_uploaded_bytes)
+                file_uploaded_bytes = status.resumable_progress
+        metadata_cache.invalidate_listing(parent_id)
+        self.__add_uploaded_bytes(media_body.received - file_uploaded_bytes)
+        self.__add_sa_usage(media_body.received)
+        self.total_files += 1
+        if not IS_TEAM_DRIVE:
+            self.__grant_permission(response["id"])
+        return self.__G_DRIVE_BASE_DOWNLOAD_URL.format(response["id"])
+
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(HttpError),
+        retry=retry_if_exception(_should_retry),
         before=before_log(LOGGER, logging.DEBUG),
     )
-    def copyFile(self, file_id, dest_id):
+    def copyFile(self, file_id, dest_id, name=None):
         body = {"parents": [dest_id]}
+        if name is not None:
+            body["name"] = name
 
         try:
-            return (
+            file = (
                 self.__service.files()
-                .copy(supportsAllDrives=True, fileId=file_id, body=body)
+                .copy(
+                    supportsAllDrives=True,
+                    fileId=file_id,
+                    body=body,
+                    fields="id, name, mimeType, size",
+                )
                 .execute()
             )
+            self.__add_sa_usage(int(file.get("size", 0)))
+            metadata_cache.invalidate_listing(dest_id)
+            return file
         except HttpError as err:
             if err.resp.get('content-type', '').startswith('application/json'):
                 reason = json.loads(err.content).get('error').get('errors')[0].get('reason')
                 if reason == 'userRateLimitExceeded' or reason == 'dailyLimitExceeded':
                     if USE_SERVICE_ACCOUNTS:
-                        if self.sa_count == self.service_account_count:
+                        if not self.switchServiceAccount(reason):
+                            self.__quota_exhausted = True
                             self.is_cancelled = True
                             raise err
                         else:
-                            self.switchServiceAccount()
-                            return self.copyFile(file_id,dest_id)
+                            return self.copyFile(file_id, dest_id, name)
                     else:
+                        self.__quota_exhausted = True
                         self.is_cancelled = True
                         LOGGER.info(f"Got: {reason}")
                         raise err
@@ -428,23 +855,30 @@ class GoogleDriveHelper:
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(HttpError),
+        retry=retry_if_exception(_should_retry),
         before=before_log(LOGGER, logging.DEBUG),
     )
     def getFileMetadata(self, file_id):
-        return (
-            self.__service.files()
-            .get(supportsAllDrives=True, fileId=file_id, fields="name,id,mimeType,size")
-            .execute()
-        )
+        meta = metadata_cache.get("meta", file_id)
+        if meta is None:
+            meta = (
+                self.__service.files()
+                .get(supportsAllDrives=True, fileId=file_id, fields="name,id,mimeType,size,md5Checksum")
+                .execute()
+            )
+            metadata_cache.put("meta", file_id, meta)
+        return meta
 
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(HttpError),
+        retry=retry_if_exception(_should_retry),
         before=before_log(LOGGER, logging.DEBUG),
     )
     def getFilesByFolderId(self, folder_id):
+        files = metadata_cache.get("list", folder_id)
+        if files is not None:
+            return list(files)
         page_token = None
         q = f"'{folder_id}' in parents"
         files = []
@@ -456,8 +890,8 @@ class GoogleDriveHelper:
                     includeTeamDriveItems=True,
                     q=q,
                     spaces="drive",
-                    pageSize=200,
-                    fields="nextPageToken, files(id, name, mimeType,size)",
+                    pageSize=1000,
+                    fields="nextPageToken, files(id, name, mimeType, size, shortcutDetails)",
                     pageToken=page_token,
                 )
                 .execute()
@@ -467,11 +901,27 @@ class GoogleDriveHelper:
             page_token = response.get("nextPageToken", None)
             if page_token is None:
                 break
-        return files
+        metadata_cache.put("list", folder_id, files)
+        return list(files)
+
+    def __get_listing(self, folder_id):
+        # Folders of the tree walked by clonehelper are not listed again.
+        # Targets of folder shortcuts are outside of it and still are.
+        if self.manifest is not None and folder_id in self.manifest.children:
+            return self.manifest.listing(folder_id)
+        return self.getFilesByFolderId(folder_id)
 
-    def clone(self, link):
+    def clone(self, link, manifest=None):
+        try:
+            return self.__clone(link, manifest)
+        finally:
+            self.__release_service_accounts()
+
+    def __clone(self, link, manifest=None):
+        if manifest is not None:
+            self.manifest = manifest
         self.is_cloning = True
-        self.start_time = time.time()
+        self.meter = ThroughputMeter()
         try:
             file_id = self.getIdFromUrl(link)
         except (KeyError, IndexError):
@@ -482,22 +932,49 @@ class GoogleDriveHelper:
         try:
             meta = self.getFileMetadata(file_id)
             if meta.get("mimeType") == self.__G_DRIVE_DIR_MIME_TYPE:
-                dir_id = self.create_directory(meta.get("name"), parent_id)
-                self.cloneFolder(
-                    meta.get("name"), meta.get("name"), meta.get("id"), dir_id
-                )
+                self.__batch = DriveBatch()
+                owner = self.__listener.uid if self.__listener is not None else id(self)
+                self.__clone_job, resumed = clone_journal.start(meta.get("id"), parent_id, owner)
+                dir_id = self.__journaled(meta.get("id")) if resumed else None
+                if dir_id is not None and not self.__folder_exists(dir_id):
+                    clone_journal.restart(self.__clone_job)
+                    dir_id = None
+                if dir_id is None:
+                    dir_id = self.create_directory(meta.get("name"), parent_id)
+                    self.__journal(meta.get("id"), dir_id)
+                else:
+                    LOGGER.info(f"Resuming clone into {dir_id}: {meta.get('name')}")
+                    if not IS_TEAM_DRIVE:
+                        # The first run may have stopped before its grants were sent
+                        self.__grant_permission(dir_id)
+                if CLONE_WORKERS > 1:
+                    self.__clone_folder_parallel(meta.get("name"), meta.get("id"), dir_id)
+                else:
+                    self.cloneFolder(
+                        meta.get("name"), meta.get("name"), meta.get("id"), dir_id
+                    )
                 durl = self.__G_DRIVE_DIR_BASE_DOWNLOAD_URL.format(dir_id)
+                if self.is_cancelled and self.__quota_exhausted:
+                    # Keep the copied part and the journal for the next /clone
+                    self.__flush_batch()
+                    self.__end_clone_job(keep=True)
+                    LOGGER.info(f"Clone stopped on quota, keeping {dir_id}: {meta.get('name')}")
+                    return (
+                        "Clone stopped, the drive quota is exhausted. The copied part was kept, "
+                        "send the same clone again later to copy the rest."
+                    ), "cancelled"
                 if self.is_cancelled:
                     LOGGER.info("Deleting cloned data from drive...")
                     msg = self.deletefile(durl)
                     LOGGER.info(f"{msg}")
+                    self.__end_clone_job()
                     return "Your clone has been stopped and cloned data has been deleted!", "cancelled"
+                self.__flush_batch()
+                self.__end_clone_job()
                 msg += f'<b>Filename : </b><code>{meta.get("name")}</code>\n<b>Size : </b>{get_readable_file_size(self.transferred_size)}'
                 buttons = button_build.ButtonMaker()
                 if SHORTENER is not None and SHORTENER_API is not None:
-                    surl = requests.get(
-                        f"https://{SHORTENER}/api?api={SHORTENER_API}&url={durl}&format=text"
-                    ).text
+                    surl = shortener.short_url(durl)
                     buttons.buildbutton("☁️ Drive Link", surl)
                 else:
                     buttons.buildbutton("☁️ Drive Link", durl)
@@ -505,9 +982,7 @@ class GoogleDriveHelper:
                     url_path = requests.utils.quote(f'{meta.get("name")}')
                     url = f"{INDEX_URL}/{url_path}/"
                     if SHORTENER is not None and SHORTENER_API is not None:
-                        siurl = requests.get(
-                            f"https://{SHORTENER}/api?api={SHORTENER_API}&url={url}&format=text"
-                        ).text
+                        siurl = shortener.short_url(url)
                         buttons.buildbutton("⚡ Index Link", siurl)
                     else:
                         buttons.buildbutton("⚡ Index Link", url)
@@ -517,9 +992,7 @@ class GoogleDriveHelper:
                 durl = self.__G_DRIVE_BASE_DOWNLOAD_URL.format(file.get("id"))
                 buttons = button_build.ButtonMaker()
                 if SHORTENER is not None and SHORTENER_API is not None:
-                    surl = requests.get(
-                        f"https://{SHORTENER}/api?api={SHORTENER_API}&url={durl}&format=text"
-                    ).text
+                    surl = shortener.short_url(durl)
                     buttons.buildbutton("☁️ Drive Link", surl)
                 else:
                     buttons.buildbutton("☁️ Drive Link", durl)
@@ -532,9 +1005,7 @@ class GoogleDriveHelper:
                     url = f"{INDEX_URL}/{url_path}"
                     urls = f'{INDEX_URL}/{url_path}?a=view'
                     if SHORTENER is not None and SHORTENER_API is not None:
-                        siurl = requests.get(
-                            f"https://{SHORTENER}/api?api={SHORTENER_API}&url={url}&format=text"
-                        ).text
+                        siurl = shortener.short_url(url)
                         buttons.buildbutton("⚡ Index Link", siurl)
                     else:
                         buttons.buildbutton("⚡ Index Link", url)
@@ -547,6 +1018,8 @@ class GoogleDriveHelper:
             if BUTTON_FIVE_NAME is not None and BUTTON_FIVE_URL is not None:
                 buttons.buildbutton(f"{BUTTON_FIVE_NAME}", f"{BUTTON_FIVE_URL}")
         except Exception as err:
+            # A failed clone can be resumed by the next /clone of the folder
+            self.__end_clone_job(keep=True)
             if isinstance(err, RetryError):
                 LOGGER.info(f"Total Attempts: {err.last_attempt.attempt_number}")
                 err = err.last_attempt.exception()
@@ -563,24 +1036,25 @@ class GoogleDriveHelper:
 
     def cloneFolder(self, name, local_path, folder_id, parent_id):
         LOGGER.info(f"Syncing: {local_path}")
-        files = self.getFilesByFolderId(folder_id)
+        files = self.__get_listing(folder_id)
         new_id = None
         if len(files) == 0:
             return parent_id
         for file in files:
             if file.get("mimeType") == self.__G_DRIVE_DIR_MIME_TYPE:
                 file_path = os.path.join(local_path, file.get("name"))
-                current_dir_id = self.create_directory(file.get("name"), parent_id)
+                current_dir_id = self.__journaled(file.get("id"))
+                if current_dir_id is None:
+                    current_dir_id = self.create_directory(file.get("name"), parent_id)
+                    self.__journal(file.get("id"), current_dir_id)
                 new_id = self.cloneFolder(
                     file.get("name"), file_path, file.get("id"), current_dir_id
                 )
             else:
                 try:
-                    self.transferred_size += int(file.get("size"))
-                except TypeError:
-                    pass
-                try:
-                    self.copyFile(file.get("id"), parent_id)
+                    if self.__journaled(file.get("id")) is None:
+                        copied = self.copyFile(file.get("id"), parent_id)
+                        self.__journal(file.get("id"), copied.get("id"))
                     new_id = parent_id
                 except Exception as e:
                     if isinstance(e, RetryError):
@@ -589,12 +1063,115 @@ class GoogleDriveHelper:
                     else:
                         err = e
                     LOGGER.error(err)
+                    continue
+                try:
+                    self.transferred_size += int(file.get("size"))
+                    self.meter.add(int(file.get("size")))
+                except TypeError:
+                    pass
         return new_id
 
+    def __clone_folder_parallel(self, name, folder_id, parent_id):
+        # Walk the source tree breadth-first on this thread, creating every
+        # destination folder as soon as it is found, while a pool of workers
+        # copies the files. Each worker authorizes on its own, so with service
+        # accounts the pool spreads them over the least loaded accounts.
+        folders = deque([(name, folder_id, parent_id)])
+        futures = []
+        with ThreadPoolExecutor(max_workers=CLONE_WORKERS) as executor:
+            while folders and not self.is_cancelled:
+                local_path, folder_id, parent_id = folders.popleft()
+                LOGGER.info(f"Syncing: {local_path}")
+                sub_folders = []
+                for file in self.__get_listing(folder_id):
+                    if self.is_cancelled:
+                        break
+                    if file.get("mimeType") == self.__G_DRIVE_DIR_MIME_TYPE:
+                        sub_folders.append(file)
+                    else:
+                        futures.append(executor.submit(self.__clone_file, file, parent_id))
+                if self.is_cancelled or len(sub_folders) == 0:
+                    continue
+                dir_ids = [self.__journaled(file.get("id")) for file in sub_folders]
+                missing = [i for i, dir_id in enumerate(dir_ids) if dir_id is None]
+                if missing:
+                    new_ids = self.__create_directories(
+                        [(sub_folders[i].get("name"), parent_id) for i in missing]
+                    )
+                    for i, dir_id in zip(missing, new_ids):
+                        dir_ids[i] = dir_id
+                        self.__journal(sub_folders[i].get("id"), dir_id)
+                for file, current_dir_id in zip(sub_folders, dir_ids):
+                    folders.append(
+                        (os.path.join(local_path, file.get("name")), file.get("id"), current_dir_id)
+                    )
+            if self.is_cancelled:
+                for future in futures:
+                    future.cancel()
+
+    def __clone_file(self, file, parent_id):
+        if self.is_cancelled:
+            return
+        try:
+            if self.__journaled(file.get("id")) is None:
+                copied = self.copyFile(file.get("id"), parent_id)
+                self.__journal(file.get("id"), copied.get("id"))
+        except Exception as e:
+            if isinstance(e, RetryError):
+                LOGGER.info(f"Total Attempts: {e.last_attempt.attempt_number}")
+                err = e.last_attempt.exception()
+            else:
+                err = e
+            LOGGER.error(err)
+            return
+        try:
+            size = int(file.get("size"))
+        except TypeError:
+            return
+        with self.__lock:
+            self.transferred_size += size
+        self.meter.add(size)
+
+    def __journaled(self, source_id):
+        if self.__clone_job is None:
+            return None
+        return clone_journal.get(self.__clone_job, source_id)
+
+    def __journal(self, source_id, dest_id):
+        if self.__clone_job is not None:
+            clone_journal.add(self.__clone_job, source_id, dest_id)
+
+    def __end_clone_job(self, keep=False):
+        job, self.__clone_job = self.__clone_job, None
+        if job is None:
+            return
+        if keep:
+            clone_journal.stop(job)
+        else:
+            clone_journal.forget(job)
+
+    def __folder_exists(self, folder_id):
+        try:
+            folder = (
+                self.__service.files()
+                .get(supportsAllDrives=True, fileId=folder_id, fields="trashed")
+                .execute()
+            )
+        except HttpError as err:
+            if err.resp.status == 404:
+                return False
+            raise err
+        return not folder.get("trashed")
+
+    def clone_resumable(self, link):
+        """:return: True if a stopped clone of link into GDRIVE_FOLDER_ID can resume"""
+        file_id = self.getIdFromUrl(link)
+        return clone_journal.resumable(file_id, parent_id)
+
     @retry(
         wait=wait_exponential(multiplier=2, min=3, max=6),
         stop=stop_after_attempt(5),
-        retry=retry_if_exception_type(HttpError),
+        retry=retry_if_exception(_should_retry),
         before=before_log(LOGGER, logging.DEBUG),
     )
     def create_directory(self, directory_name, parent_id):
@@ -610,8 +1187,9 @@ class GoogleDriveHelper:
             .execute()
         )
         file_id = file.get("id")
+        metadata_cache.invalidate_listing(parent_id)
         if not IS_TEAM_DRIVE:
-            self.__set_permission(file_id)
+            self.__grant_permission(file_id)
         LOGGER.info(
             "Created Google-Drive Folder:\nName: {}\nID: {} ".format(
                 file.get("name"), file_id
@@ -619,7 +1197,96 @@ class GoogleDriveHelper:
         )
         return file_id
 
+    def __create_directories(self, directories):
+        """
+        Creates many folders through one batch per BATCH_LIMIT folders
+        :param directories: list of (name, parent_id)
+        :return: ids of the new folders, in the same order
+        """
+        batch = self.__batch or DriveBatch()
+        dir_ids = [None] * len(directories)
+        failed = {}
+
+        def factory(name, parent):
+            file_metadata = {
+                "name": name,
+                "mimeType": self.__G_DRIVE_DIR_MIME_TYPE,
+                "parents": [parent],
+            }
+            return lambda service: service.files().create(
+                supportsTeamDrives=True, body=file_metadata
+            )
+
+        def callback(index):
+            def on_response(response, exception):
+                if exception is not None:
+                    failed[index] = exception
+                else:
+                    dir_ids[index] = response["id"]
+            return on_response
+
+        for index, (name, parent) in enumerate(directories):
+            # Not retried by the batch, a create that failed may exist anyway
+            batch.add(factory(name, parent), callback(index))
+        # The flush also sends the grants queued on the shared batch
+        batch.flush(self.__service)
+        errors = []
+        for index, exception in failed.items():
+            name, parent = directories[index]
+            if not isinstance(exception, HttpError) or exception.resp.status not in RETRY_STATUSES:
+                errors.append(exception)
+                continue
+            try:
+                dir_ids[index] = self.__find_folder(name, parent) or self.__create_folder(name, parent)
+            except HttpError as err:
+                errors.append(err)
+        for _, parent in directories:
+            metadata_cache.invalidate_listing(parent)
+        if errors:
+            # The folders created so far are not handed to anything
+            self.delete_files([dir_id for dir_id in dir_ids if dir_id is not None])
+            raise errors[0]
+        self.__retry_failed_grants()
+        LOGGER.info(f"Created {len(dir_ids)} Google-Drive Folders")
+        if not IS_TEAM_DRIVE:
+            for dir_id in dir_ids:
+                self.__grant_permission(dir_id)
+        return dir_ids
+
+    def __find_folder(self, name, parent):
+        """:return: id of a folder named name in parent, None if there is none"""
+        name = name.replace("\\", "\\\\").replace("'", "\\'")
+        response = (
+            self.__service.files()
+            .list(
+                supportsAllDrives=True,
+                includeItemsFromAllDrives=True,
+                q=f"name = '{name}' and '{parent}' in parents and "
+                f"mimeType = '{self.__G_DRIVE_DIR_MIME_TYPE}' and trashed = false",
+                spaces="drive",
+                fields="files(id)",
+            )
+            .execute()
+        )
+        files = response.get("files", [])
+        return files[0]["id"] if files else None
+
+    def __create_folder(self, name, parent):
+        # Sent once: the lookup before it found no copy of the folder
+        file_metadata = {
+            "name": name,
+            "mimeType": self.__G_DRIVE_DIR_MIME_TYPE,
+            "parents": [parent],
+        }
+        return (
+            self.__service.files()
+            .create(supportsTeamDrives=True, body=file_metadata, fields="id")
+            .execute()["id"]
+        )
+
     def upload_dir(self, input_directory, parent_id):
+        if UPLOAD_WORKERS > 1:
+            return self.__upload_dir_parallel(input_directory, parent_id)
         list_dirs = os.listdir(input_directory)
         if len(list_dirs) == 0:
             return parent_id
@@ -630,66 +1297,136 @@ class GoogleDriveHelper:
                 return None
             if os.path.isdir(current_file_name):
                 current_dir_id = self.create_directory(item, parent_id)
+                self.total_folders += 1
                 new_id = self.upload_dir(current_file_name, current_dir_id)
             else:
                 mime_type = get_mime_type(current_file_name)
                 file_name = current_file_name.split("/")[-1]
                 # current_file_name will have the full path
-                self.upload_file(current_file_name, file_name, mime_type, parent_id)
+                self.__upload_or_reuse(current_file_name, file_name, mime_type, parent_id)
+                self.total_files += 1
                 new_id = parent_id
         return new_id
 
-    def authorize(self):
-        # Get credentials
-        credentials = None
-        if not USE_SERVICE_ACCOUNTS:
-            if os.path.exists(self.__G_DRIVE_TOKEN_FILE):
-                with open(self.__G_DRIVE_TOKEN_FILE, "rb") as f:
-                    credentials = pickle.load(f)
-            if credentials is None or not credentials.valid:
-                if credentials and credentials.expired and credentials.refresh_token:
-                    credentials.refresh(Request())
-                else:
-                    flow = InstalledAppFlow.from_client_secrets_file(
-                        "credentials.json", self.__OAUTH_SCOPE
-                    )
-                    LOGGER.info(flow)
-                    credentials = flow.run_console(port=0)
+    def __upload_or_reuse(self, file_path, file_name, mime_type, parent_id):
+        if SKIP_DUPLICATE_UPLOADS:
+            size = os.path.getsize(file_path)
+            # Only hash files whose size is in the index at all
+            if size > 0 and content_index.has_size(size):
+                duplicate = content_index.find(self.__md5(file_path), size)
+                if duplicate is not None:
+                    LOGGER.info(f"Copying identical {duplicate[1]} instead of uploading {file_name}")
+                    self.copyFile(duplicate[0], parent_id, file_name)
+                    self.__add_uploaded_bytes(size, transferred=False)
+                    return
+        self.upload_file(file_path, file_name, mime_type, parent_id)
 
-                # Save the credentials for the next run
-                with open(self.__G_DRIVE_TOKEN_FILE, "wb") as token:
-                    pickle.dump(credentials, token)
-        else:
-            LOGGER.info(
-                f"Authorizing with {SERVICE_ACCOUNT_INDEX}.json service account"
-            )
-            credentials = service_account.Credentials.from_service_account_file(
-                f"accounts/{SERVICE_ACCOUNT_INDEX}.json", scopes=self.__OAUTH_SCOPE
+    @staticmethod
+    def __md5(file_path):
+        digest = hashlib.md5()
+        with open(file_path, "rb") as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def __upload_dir_parallel(self, input_directory, parent_id):
+        # Create the whole folder tree first, so that files of every folder
+        # can be handed out to the workers in any order
+        dir_ids = {input_directory: parent_id}
+        depths = {input_directory: 0}
+        levels = []
+        dir_files = []
+        for dirpath, dirnames, filenames in os.walk(input_directory, followlinks=True):
+            depth = depths[dirpath]
+            if dirnames and len(levels) == depth:
+                levels.append([])
+            for item in dirnames:
+                depths[os.path.join(dirpath, item)] = depth + 1
+                levels[depth].append((os.path.join(dirpath, item), item, dirpath))
+            for item in filenames:
+                dir_files.append((os.path.join(dirpath, item), item, dirpath))
+        # Folders of one level only depend on the level above, so each level
+        # is created through batched requests
+        for level in levels:
+            if self.is_cancelled:
+                return None
+            new_ids = self.__create_directories(
+                [(item, dir_ids[dirpath]) for _, item, dirpath in level]
             )
-        return build("drive", "v3", credentials=credentials, cache_discovery=False)
-
-    def edit_telegraph(self):
-        nxt_page = 1
-        prev_page = 0
-        for content in self.telegraph_content:
-            if nxt_page == 1:
-                content += f'<b><a href="https://telegra.ph/{self.path[nxt_page]}">Next</a></b>'
-                nxt_page += 1
+            for (path, _, _), dir_id in zip(level, new_ids):
+                dir_ids[path] = dir_id
+            self.total_folders += len(level)
+        files = [(path, item, dir_ids[dirpath]) for path, item, dirpath in dir_files]
+        if len(files) == 0:
+            return parent_id
+        LOGGER.info(f"Uploading {len(files)} files with {UPLOAD_WORKERS} workers: {self.name}")
+        with ThreadPoolExecutor(max_workers=UPLOAD_WORKERS) as executor:
+            futures = [
+                executor.submit(self.__upload_dir_file, *item) for item in files
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                # Stop the running workers at their next chunk
+                self.is_cancelled = True
+                for future in futures:
+                    future.cancel()
+                raise
+        if self.is_cancelled:
+            return None
+        return parent_id
+
+    def __upload_dir_file(self, file_path, file_name, parent_id):
+        if self.is_cancelled:
+            return
+        mime_type = get_mime_type(file_path)
+        self.__upload_or_reuse(file_path, file_name, mime_type, parent_id)
+        if self.is_cancelled:
+            return
+        with self.__lock:
+            self.total_files += 1
+
+    def authorize(self, sa_index=None):
+        # Services are built once per thread and credential, see drive_service
+        if not USE_SERVICE_ACCOUNTS:
+            return get_service(self.__G_DRIVE_TOKEN_FILE, self.__load_token)
+        if sa_index is None:
+            sa_index = sa_pool.acquire()
+            if sa_index is None:
+                LOGGER.warning("All service accounts are exhausted, using the least loaded one")
+                sa_index = sa_pool.acquire(healthy_only=False)
+        with self.__lock:
+            self.__sa_leases.append(sa_index)
+        self.__local.sa_index = sa_index
+        sa_file = f"accounts/{sa_index}.json"
+        return get_service(
+            sa_file,
+            lambda: service_account.Credentials.from_service_account_file(
+                sa_file, scopes=self.__OAUTH_SCOPE
+            ),
+        )
+
+    def __load_token(self):
+        # Get credentials
+        credentials = None
+        if os.path.exists(self.__G_DRIVE_TOKEN_FILE):
+            with open(self.__G_DRIVE_TOKEN_FILE, "rb") as f:
+                credentials = pickle.load(f)
+        if credentials is None or not credentials.valid:
+            if credentials and credentials.expired and credentials.refresh_token:
+                credentials.refresh(Request(session))
             else:
-                if prev_page <= self.num_of_path:
-                    content += f'<b><a href="https://telegra.ph/{self.path[prev_page]}">Prev</a></b>'
-                    prev_page += 1
-                if nxt_page < self.num_of_path:
-                    content += f'<b> | <a href="https://telegra.ph/{self.path[nxt_page]}">Next</a></b>'
-                    nxt_page += 1
-            Telegraph(access_token=telegraph_token).edit_page(
-                path=self.path[prev_page],
-                title="Mirror Bot Search",
-                author_name="Mirror Bot",
-                author_url="https://github.com/magneto261290/magneto-python-aria",
-                html_content=content,
-            )
-        return
+                flow = InstalledAppFlow.from_client_secrets_file(
+                    "credentials.json", self.__OAUTH_SCOPE
+                )
+                LOGGER.info(flow)
+                credentials = flow.run_console(port=0)
+
+            # Save the credentials for the next run
+            with open(self.__G_DRIVE_TOKEN_FILE, "wb") as token:
+                pickle.dump(credentials, token)
+        return credentials
 
     def escapes(self, str):
         chars = ["\\", "'", '"', r"\a", r"\b", r"\f", r"\n", r"\r", r"\t"]
@@ -704,17 +1441,72 @@ class GoogleDriveHelper:
             size = 0
         self.total_bytes += size
 
-    def gDrive_directory(self, **kwargs) -> None:
-        files = self.getFilesByFolderId(kwargs["id"])
-        if len(files) == 0:
-            return
-        for file_ in files:
-            if file_["mimeType"] == self.__G_DRIVE_DIR_MIME_TYPE:
-                self.total_folders += 1
-                self.gDrive_directory(**file_)
-            else:
-                self.total_files += 1
-                self.gDrive_file(**file_)
+    def gDrive_directory(self, **kwargs) -> DriveManifest:
+        manifest = self.build_manifest(kwargs)
+        self.total_bytes += manifest.total_size
+        self.total_files += manifest.file_count
+        self.total_folders += manifest.folder_count
+        return manifest
+
+    def build_manifest(self, root):
+        """
+        Lists a whole folder tree breadth-first. Each query asks for the
+        children of up to PARENTS_PER_QUERY folders, and the queries of one
+        level run concurrently.
+        :param root: metadata of the folder, as returned by getFileMetadata
+        """
+        manifest = DriveManifest(root)
+        level = [root["id"]]
+        queries = 0
+        with ThreadPoolExecutor(max_workers=TRAVERSE_WORKERS) as executor:
+            while level:
+                groups = [
+                    level[i : i + PARENTS_PER_QUERY]
+                    for i in range(0, len(level), PARENTS_PER_QUERY)
+                ]
+                level = []
+                for group, items in zip(groups, executor.map(self.__list_children, groups)):
+                    level += manifest.add_listing(group, items)
+                    # Later walks of these folders are served from the cache
+                    for folder_id in group:
+                        metadata_cache.put("list", folder_id, manifest.listing(folder_id))
+                queries += len(groups)
+        LOGGER.info(
+            f"Listed {manifest.folder_count} folders and {manifest.file_count} files "
+            f"with {queries} queries: {root.get('name')}"
+        )
+        return manifest
+
+    @retry(
+        wait=wait_exponential(multiplier=2, min=3, max=6),
+        stop=stop_after_attempt(5),
+        retry=retry_if_exception(_should_retry),
+        before=before_log(LOGGER, logging.DEBUG),
+    )
+    def __list_children(self, folder_ids):
+        q = " or ".join(f"'{folder_id}' in parents" for folder_id in folder_ids)
+        files = []
+        page_token = None
+        while True:
+            response = (
+                self.__service.files()
+                .list(
+                    supportsAllDrives=True,
+                    includeItemsFromAllDrives=True,
+                    q=q,
+                    spaces="drive",
+                    pageSize=1000,
+                    fields="nextPageToken, files(id, name, mimeType, size, md5Checksum, parents, shortcutDetails)",
+                    pageToken=page_token,
+                )
+                .execute()
+            )
+            files.extend(response.get("files", []))
+            page_token = response.get("nextPageToken")
+            if page_token is None:
+                break
+        return files
+
     def clonehelper(self, link):
         try:
             file_id = self.getIdFromUrl(link)
@@ -723,12 +1515,11 @@ class GoogleDriveHelper:
             return msg, "", "", ""
         LOGGER.info(f"File ID: {file_id}")
         try:
-            drive_file = self.__service.files().get(fileId=file_id, fields="id, name, mimeType, size",
-                                                   supportsTeamDrives=True).execute()
+            drive_file = self.getFileMetadata(file_id)
             name = drive_file['name']
             LOGGER.info(f"Checking: {name}")
             if drive_file['mimeType'] == self.__G_DRIVE_DIR_MIME_TYPE:
-                self.gDrive_directory(**drive_file)
+                self.manifest = self.gDrive_directory(**drive_file)
             else:
                 try:
                     self.total_files += 1
@@ -744,12 +1535,18 @@ class GoogleDriveHelper:
             return msg, "", "", ""
         return "", clonesize, name, files            
 
-    def download(self, link):
+    def download(self, link, manifest=None):
+        try:
+            return self.__download(link, manifest)
+        finally:
+            self.__release_service_accounts()
+
+    def __download(self, link, manifest=None):
+        if manifest is not None:
+            self.manifest = manifest
         self.is_downloading = True
+        self.meter = ThroughputMeter()
         file_id = self.getIdFromUrl(link)
-        if USE_SERVICE_ACCOUNTS:
-            self.service_account_count = len(os.listdir("accounts"))
-        self.updater = setInterval(self.update_interval, self._on_download_progress)
         try:
             meta = self.getFileMetadata(file_id)
             path = f"{DOWNLOAD_DIR}{self.__listener.uid}/"
@@ -758,7 +1555,7 @@ class GoogleDriveHelper:
             else:
                 os.makedirs(path)
                 self.download_file(
-                    file_id, path, meta.get("name"), meta.get("mimeType")
+                    file_id, path, meta.get("name"), meta.get("mimeType"), meta.get("size")
                 )
         except Exception as err:
             if isinstance(err, RetryError):
@@ -770,93 +1567,212 @@ class GoogleDriveHelper:
             self.__listener.onDownloadError(err)
             return
         finally:
-            self.updater.cancel()
             if self.is_cancelled:
                 return
         self.__listener.onDownloadComplete()
 
     def download_folder(self, folder_id, path, folder_name):
+        if DOWNLOAD_WORKERS > 1:
+            return self.__download_folder_parallel(folder_id, path, folder_name)
         if not os.path.exists(path + folder_name):
             os.makedirs(path + folder_name)
         path += folder_name + "/"
-        result = []
-        page_token = None
-        while True:
-            files = (
-                self.__service.files()
-                .list(
-                    supportsTeamDrives=True,
-                    includeTeamDriveItems=True,
-                    q=f"'{folder_id}' in parents",
-                    fields="nextPageToken, files(id, name, mimeType, size, shortcutDetails)",
-                    pageToken=page_token,
-                    pageSize=1000,
-                )
-                .execute()
-            )
-            result.extend(files["files"])
-            page_token = files.get("nextPageToken")
-            if not page_token:
-                break
+        for file_id, filename, mime_type, size in self.__list_download_folder(folder_id):
+            if mime_type == self.__G_DRIVE_DIR_MIME_TYPE:
+                self.download_folder(file_id, path, filename)
+            elif not os.path.isfile(path + filename):
+                self.download_file(file_id, path, filename, mime_type, size)
+            if self.is_cancelled:
+                return
 
+    def __list_download_folder(self, folder_id):
+        """
+        :return: (id, name, mime type, size) of the folder's children sorted
+            by name, with shortcuts resolved to their targets
+        """
+        result = self.__get_listing(folder_id)
         result = sorted(result, key=lambda k: k["name"])
+        items = []
         for item in result:
             file_id = item["id"]
-            filename = item["name"]
             mime_type = item["mimeType"]
             shortcut_details = item.get("shortcutDetails", None)
             if shortcut_details != None:
                 file_id = shortcut_details["targetId"]
                 mime_type = shortcut_details["targetMimeType"]
-            if mime_type == "application/vnd.google-apps.folder":
-                self.download_folder(file_id, path, filename)
-            elif not os.path.isfile(path + filename):
-                self.download_file(file_id, path, filename, mime_type)
+            items.append((file_id, item["name"], mime_type, item.get("size")))
+        return items
+
+    def __download_folder_parallel(self, folder_id, path, folder_name):
+        # List the whole tree first, so that files of every folder can be
+        # handed out to the workers in any order
+        files = []
+        # Local paths already given to a worker. Like the serial download,
+        # only the first of the files sharing a name is kept, so every path
+        # gets a single writer.
+        queued = set()
+        folders = deque([(folder_id, f"{path}{folder_name}/")])
+        while folders:
             if self.is_cancelled:
                 return
+            folder_id, folder_path = folders.popleft()
+            os.makedirs(folder_path, exist_ok=True)
+            for file_id, filename, mime_type, size in self.__list_download_folder(folder_id):
+                if mime_type == self.__G_DRIVE_DIR_MIME_TYPE:
+                    folders.append((file_id, f"{folder_path}{filename}/"))
+                elif (
+                    folder_path + filename not in queued
+                    and not os.path.isfile(folder_path + filename)
+                ):
+                    queued.add(folder_path + filename)
+                    files.append((file_id, folder_path, filename, mime_type, size))
+        if len(files) == 0:
+            return
+        LOGGER.info(f"Downloading {len(files)} files with {DOWNLOAD_WORKERS} workers: {self.name}")
+        with ThreadPoolExecutor(max_workers=DOWNLOAD_WORKERS) as executor:
+            futures = [
+                executor.submit(self.__download_folder_file, *item) for item in files
+            ]
+            try:
+                for future in as_completed(futures):
+                    future.result()
+            except Exception:
+                # Stop the running workers at their next chunk
+                self.is_cancelled = True
+                for future in futures:
+                    future.cancel()
+                raise
 
-    def download_file(self, file_id, path, filename, mime_type):
+    def __download_folder_file(self, file_id, path, filename, mime_type, size):
+        if self.is_cancelled:
+            return
+        self.download_file(file_id, path, filename, mime_type, size)
+
+    def download_file(self, file_id, path, filename, mime_type, size=None):
+        if size is not None and DOWNLOAD_CONNECTIONS > 1 and int(size) > RANGE_SIZE:
+            return self.__download_ranges(file_id, f"{path}{filename}", int(size))
         request = self.__service.files().get_media(fileId=file_id)
         fh = io.FileIO(f"{path}{filename}", "wb")
         downloader = MediaIoBaseDownload(fh, request, chunksize=100 * 1024 * 1024)
+        file_downloaded_bytes = 0
         done = False
         while done is False:
             if self.is_cancelled:
                 fh.close()
                 break
             try:
-                self.dstatus, done = downloader.next_chunk()
+                status, done = downloader.next_chunk()
             except HttpError as err:
                  if err.resp.get('content-type', '').startswith('application/json'):
                      reason = json.loads(err.content).get('error').get('errors')[0].get('reason')
                      if reason == 'downloadQuotaExceeded' or reason == 'dailyLimitExceeded':
                          if USE_SERVICE_ACCOUNTS:
-                             if self.sa_count == self.service_account_count:
+                             if not self.switchServiceAccount(reason):
                                  self.is_cancelled = True
                                  raise err
                              else:
-                                 self.switchServiceAccount()
                                  LOGGER.info(f"Got: {reason}, Trying Again...")
-                                 return self.download_file(file_id, path, filename, mime_type)
+                                 # Counted again by the new download
+                                 self.__add_downloaded_bytes(-file_downloaded_bytes)
+                                 return self.download_file(file_id, path, filename, mime_type, size)
                          else:
                              self.is_cancelled = True
                              LOGGER.info(f"Got: {reason}")
                              raise err
                      else:
                          raise err
-        self._file_downloaded_bytes = 0
+                 continue
+            self.__add_downloaded_bytes(status.resumable_progress - file_downloaded_bytes)
+            file_downloaded_bytes = status.resumable_progress
 
-    def _on_download_progress(self):
-        if self.dstatus is not None:
-            chunk_size = (
-                self.dstatus.total_size * self.dstatus.progress()
-                - self._file_downloaded_bytes
-            )
-            self._file_downloaded_bytes = (
-                self.dstatus.total_size * self.dstatus.progress()
-            )
-            self.downloaded_bytes += chunk_size
-            self.dtotal_time += self.update_interval
+    def __download_ranges(self, file_id, file_path, size):
+        """
+        Downloads a file as RANGE_SIZE byte ranges over DOWNLOAD_CONNECTIONS
+        connections, each range written in place into a preallocated file
+        """
+        fd = os.open(file_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, size)
+            ranges = [
+                (start, min(start + RANGE_SIZE, size) - 1)
+                for start in range(0, size, RANGE_SIZE)
+            ]
+            with ThreadPoolExecutor(max_workers=min(DOWNLOAD_CONNECTIONS, len(ranges))) as executor:
+                futures = [
+                    executor.submit(self.__download_range, file_id, fd, start, end)
+                    for start, end in ranges
+                ]
+                try:
+                    for future in as_completed(futures):
+                        future.result()
+                except Exception:
+                    self.is_cancelled = True
+                    for future in futures:
+                        future.cancel()
+                    raise
+        finally:
+            os.close(fd)
+
+    def __download_range(self, file_id, fd, start, end):
+        # In RANGE_PIECE pieces, so DOWNLOAD_WORKERS x DOWNLOAD_CONNECTIONS
+        # ranges at once do not each hold RANGE_SIZE bytes in memory
+        offset = start
+        while offset <= end:
+            piece_end = min(offset + RANGE_PIECE, end + 1) - 1
+            content = self.__fetch_range(file_id, offset, piece_end)
+            if content is None:
+                return
+            view = memoryview(content)
+            position = offset
+            while view:
+                written = os.pwrite(fd, view, position)
+                view = view[written:]
+                position += written
+            self.__add_downloaded_bytes(len(content))
+            offset = piece_end + 1
+
+    def __fetch_range(self, file_id, start, end):
+        """:return: bytes start to end of the file, None if cancelled"""
+        attempt = 0
+        while not self.is_cancelled:
+            request = self.__service.files().get_media(fileId=file_id)
+            request.headers["range"] = f"bytes={start}-{end}"
+            try:
+                content = request.execute()
+                if len(content) != end - start + 1:
+                    raise IOError(f"Got {len(content)} bytes for range {start}-{end}")
+            except HttpError as err:
+                reason = None
+                if err.resp.get('content-type', '').startswith('application/json'):
+                    reason = json.loads(err.content).get('error').get('errors')[0].get('reason')
+                if reason == 'downloadQuotaExceeded' or reason == 'dailyLimitExceeded':
+                    # Only this thread's service moves to another account
+                    if USE_SERVICE_ACCOUNTS and self.switchServiceAccount(reason):
+                        LOGGER.info(f"Got: {reason}, Trying Again...")
+                        continue
+                    self.is_cancelled = True
+                    LOGGER.info(f"Got: {reason}")
+                    raise err
+                attempt += 1
+                if err.resp.status not in [429, 500, 502, 503, 504] or attempt >= RANGE_RETRIES:
+                    raise err
+                LOGGER.info(f"Retrying range {start}-{end}: {err}")
+                time.sleep(2 ** attempt)
+                continue
+            except OSError as err:
+                attempt += 1
+                if attempt >= RANGE_RETRIES:
+                    raise err
+                LOGGER.info(f"Retrying range {start}-{end}: {err}")
+                time.sleep(2 ** attempt)
+                continue
+            return content
+        return None
+
+    def __add_downloaded_bytes(self, size):
+        with self.__lock:
+            self.downloaded_bytes += size
+        self.meter.add(size)
 
     def cancel_download(self):
         self.is_cancelled = True
@@ -871,6 +1787,13 @@ class GoogleDriveHelper:
 
 
     def uni_drive_list(self, fileName):
+        try:
+            return self.__uni_drive_list(fileName)
+        finally:
+            # The search threads are long-lived, their leases end here
+            self.__release_service_accounts()
+
+    def __uni_drive_list(self, fileName):
         search_type = None
         if re.search("^-d ", fileName, re.IGNORECASE):
             search_type = '-d'
@@ -887,9 +1810,9 @@ class GoogleDriveHelper:
         content_count = 0
         reached_max_limit = False
         add_title_msg = True
-        for parent_id in DRIVE_ID :
+        responses, complete = self.__query_drives(search_type, fileName)
+        for response in responses:
             add_drive_title = True
-            response = self.drive_query(parent_id, search_type, fileName)
             #LOGGER.info(f"my a: {response}")
             INDEX += 1
             if response:
@@ -898,7 +1821,10 @@ class GoogleDriveHelper:
                         msg = f'<h3>I found these results for your search query: {fileName}</h3>'
                         add_title_msg = False
                     if add_drive_title == True:
-                        msg += f"<br><b>{DRIVE_NAME[INDEX]}</b><br><br>"
+                        msg += f"<br><b>{DRIVE_NAME[INDEX]}</b>"
+                        if not complete[INDEX]:
+                            msg += " (partial results)"
+                        msg += "<br><br>"
                         add_drive_title = False
                     if file.get('mimeType') == "application/vnd.google-apps.folder":  # Detect Whether Current Entity is a Folder or File.
                         msg += f"🗃️<code>{file.get('name')}</code> <b>(folder)</b><br>" \
@@ -930,23 +1856,23 @@ class GoogleDriveHelper:
             self.telegraph_content.append(msg)
         if len(self.telegraph_content) == 0:
             return "I ..I found nothing of that sort :(", None
-        for content in self.telegraph_content :
-            self.path.append(Telegraph(access_token=telegraph_token).create_page(
-                                            title = 'Mirrorbot Search',
-                                            author_name='Repo Link',
-                                            author_url='https://github.com/harshpreets63/Mirror-Bot',
-                                            html_content=content
-                                            )['path'])    
-        self.num_of_path = len(self.path)
-        if self.num_of_path > 1:
-            self.edit_telegraph()
+        self.path = telegraph.publish('Mirrorbot Search', self.telegraph_content)
         msg = f"Found {content_count}" + ("+" if content_count >= 80 else "") + " results"
         if reached_max_limit:
             msg += ". (Only showing top 80 results. Omitting remaining results)"
+        timed_out = complete.count(False)
+        if timed_out:
+            msg += f"\n{timed_out} drive(s) did not answer in time, their results may be incomplete"
         buttons = button_build.ButtonMaker()
         buttons.buildbutton("Click Here for results", f"https://telegra.ph/{self.path[0]}")
         return msg, InlineKeyboardMarkup(buttons.build_menu(1))
     def drive_list(self, fileName):
+        try:
+            return self.__drive_list(fileName)
+        finally:
+            self.__release_service_accounts()
+
+    def __drive_list(self, fileName):
         msg = ""
         fileName = self.escapes(str(fileName))
         # Create Search Query for API request.
@@ -971,6 +1897,22 @@ class GoogleDriveHelper:
 
         msg += f"<h4>Results : {fileName}</h4><br><br>"
 
+        short_links = {}
+        if SHORTENER is not None and SHORTENER_API is not None:
+            # Shorten every link of the results at once, the loop below
+            # looks them up here instead of fetching them one by one
+            urls = []
+            for file in response.get("files", []):
+                url_path = requests.utils.quote(f'{file.get("name")}')
+                if file.get("mimeType") == "application/vnd.google-apps.folder":
+                    urls.append(f"https://drive.google.com/drive/folders/{file.get('id')}")
+                    url_path += "/"
+                else:
+                    urls.append(f"https://drive.google.com/uc?id={file.get('id')}&export=download")
+                if INDEX_URL is not None:
+                    urls.append(f"{INDEX_URL}/{url_path}")
+            short_links = shortener.short_urls(urls)
+
         for file in response.get("files", []):
             if (
                 file.get("mimeType") == "application/vnd.google-apps.folder"
@@ -978,9 +1920,7 @@ class GoogleDriveHelper:
                 furl = f"https://drive.google.com/drive/folders/{file.get('id')}"
                 msg += f"⁍<code>{file.get('name')}<br>(folder)</code><br>"
                 if SHORTENER is not None and SHORTENER_API is not None:
-                    sfurl = requests.get(
-                        f"https://{SHORTENER}/api?api={SHORTENER_API}&url={furl}&format=text"
-                    ).text
+                    sfurl = short_links.get(furl, furl)
                     msg += f"<b><a href={sfurl}>Drive Link</a></b>"
                 else:
                     msg += f"<b><a href={furl}>Drive Link</a></b>"
@@ -988,9 +1928,7 @@ class GoogleDriveHelper:
                     url_path = requests.utils.quote(f'{file.get("name")}')
                     url = f"{INDEX_URL}/{url_path}/"
                     if SHORTENER is not None and SHORTENER_API is not None:
-                        siurl = requests.get(
-                            f"https://{SHORTENER}/api?api={SHORTENER_API}&url={url}&format=text"
-                        ).text
+                        siurl = short_links.get(url, url)
                         msg += f' <b>| <a href="{siurl}">Index Link</a></b>'
                     else:
                         msg += f' <b>| <a href="{url}">Index Link</a></b>'
@@ -1000,9 +1938,7 @@ class GoogleDriveHelper:
                 )
                 msg += f"⁍<code>{file.get('name')}<br>({get_readable_file_size(int(file.get('size')))})</code><br>"
                 if SHORTENER is not None and SHORTENER_API is not None:
-                    sfurl = requests.get(
-                        f"https://{SHORTENER}/api?api={SHORTENER_API}&url={furl}&format=text"
-                    ).text
+                    sfurl = short_links.get(furl, furl)
                     msg += f"<b><a href={sfurl}>Drive Link</a></b>"
                 else:
                     msg += f"<b><a href={furl}>Drive Link</a></b>"
@@ -1011,9 +1947,7 @@ class GoogleDriveHelper:
                     url = f"{INDEX_URL}/{url_path}"
                     urls = f'{INDEX_URL}/{url_path}?a=view'
                     if SHORTENER is not None and SHORTENER_API is not None:
-                        siurl = requests.get(
-                            f"https://{SHORTENER}/api?api={SHORTENER_API}&url={url}&format=text"
-                        ).text
+                        siurl = short_links.get(url, url)
                         msg += f' <b>| <a href="{siurl}">Index Link</a></b>'
                     else:
                         msg += f' <b>| <a href="{url}">Index Link</a></b>'
@@ -1033,19 +1967,7 @@ class GoogleDriveHelper:
         if len(self.telegraph_content) == 0:
             return "No Result Found :(", None
 
-        for content in self.telegraph_content:
-            self.path.append(
-                Telegraph(access_token=telegraph_token).create_page(
-                    title="Mirror Bot Search",
-                    author_name="Repo Link",
-                    author_url="https://github.com/harshpreets63/Mirror-Bot",
-                    html_content=content,
-                )["path"]
-            )
-
-        self.num_of_path = len(self.path)
-        if self.num_of_path > 1:
-            self.edit_telegraph()
+        self.path = telegraph.publish("Mirror Bot Search", self.telegraph_content)
 
         msg = f"<b>Search Results For {fileName} </b>"
         buttons = button_build.ButtonMaker()
@@ -1053,7 +1975,98 @@ class GoogleDriveHelper:
 
         return msg, InlineKeyboardMarkup(buttons.build_menu(1))
 
-    def drive_query(self, parent_id, search_type, fileName):
+    @new_thread
+    def start_drive_index(self):
+        self.sync_drive_index()
+        self.updater = setInterval(SEARCH_INDEX_INTERVAL, self.sync_drive_index)
+
+    def sync_drive_index(self):
+        try:
+            drive_index.sync(self.__service, DRIVE_ID)
+        except Exception as err:
+            LOGGER.error(f"Unable to update the search index: {err}")
+        finally:
+            # This helper lives as long as the bot, it leases again next sync
+            self.__release_service_accounts()
+
+    def __query_drives(self, search_type, fileName):
+        """
+        Searches every drive of DRIVE_ID at once, answering from the search
+        index where it can. Drives still busy at SEARCH_DEADLINE return the
+        pages they got so far.
+        :return: (list of files per drive, list of whether each drive
+            finished), both in DRIVE_ID order
+        """
+        responses = [[] for _ in DRIVE_ID]
+        complete = [True] * len(DRIVE_ID)
+        deadline = time.time() + SEARCH_DEADLINE
+        futures = {}
+        for index, drive_id in enumerate(DRIVE_ID):
+            if SEARCH_INDEX and drive_index.ready(drive_id):
+                responses[index] = drive_index.search(drive_id, search_type, fileName)
+            else:
+                future = search_executor.submit(
+                    self.drive_query, drive_id, search_type, fileName, responses[index], deadline
+                )
+                futures[future] = index
+        finished, _ = wait(futures, timeout=max(deadline - time.time(), 0))
+        for future, index in futures.items():
+            if future not in finished:
+                LOGGER.info(f"Search in {DRIVE_NAME[index]} missed the deadline")
+                complete[index] = False
+            elif future.exception() is not None:
+                LOGGER.error(f"Search in {DRIVE_NAME[index]} failed: {future.exception()}")
+                complete[index] = False
+        # Copy, as a late drive may still append to its list
+        return [list(response) for response in responses], complete
+
+    @new_thread
+    def start_content_index(self):
+        self.sync_content_index()
+        self.updater = setInterval(CONTENT_INDEX_INTERVAL, self.sync_content_index)
+
+    def sync_content_index(self):
+        try:
+            content_index.sync(self.__service, parent_id)
+        except Exception as err:
+            LOGGER.error(f"Unable to update the content index: {err}")
+        finally:
+            self.__release_service_accounts()
+
+    def find_duplicates(self, link):
+        """
+        Looks the files of a clone source up in the content index
+        :return: (files in the source, files already under GDRIVE_FOLDER_ID),
+            None while the index is not ready
+        """
+        if not content_index.ready():
+            return None
+        meta = self.getFileMetadata(self.getIdFromUrl(link))
+        if meta.get("mimeType") == self.__G_DRIVE_DIR_MIME_TYPE:
+            if self.manifest is None or self.manifest.root["id"] != meta["id"]:
+                self.manifest = self.build_manifest(meta)
+            files = [
+                item
+                for item in self.manifest.items.values()
+                if item["mimeType"] != self.__G_DRIVE_DIR_MIME_TYPE
+            ]
+        else:
+            files = [meta]
+        found = sum(
+            1
+            for file in files
+            if content_index.find(file.get("md5Checksum"), file.get("size", 0)) is not None
+        )
+        return len(files), found
+
+    def drive_query(self, parent_id, search_type, fileName, files=None, deadline=None):
+        """
+        :param files: list the results are appended to page by page, so a
+            caller that stops waiting still gets the pages received so far
+        :param deadline: time after which no further page is requested
+        """
+        if files is None:
+            files = []
         query = ""
         if search_type is not None:
             if search_type == '-d':
@@ -1064,23 +2077,31 @@ class GoogleDriveHelper:
         for text in var:
             query += f"name contains '{text}' and "
         query += "trashed=false"
-        if parent_id != "root":
-            response = self.__service.files().list(supportsTeamDrives=True,
-                                                   includeTeamDriveItems=True,
-                                                   teamDriveId=parent_id,
-                                                   q=query,
-                                                   corpora='drive',
-                                                   spaces='drive',
-                                                   pageSize=1000,
-                                                   fields='files(id, name, mimeType, size, teamDriveId, parents)',
-                                                   orderBy='folder, modifiedTime desc').execute()["files"]
-        else:
-            response = self.__service.files().list(q=query + " and 'me' in owners",
-                                                   pageSize=1000,
-                                                   spaces='drive',
-                                                   fields='files(id, name, mimeType, size, parents)',
-                                                   orderBy='folder, modifiedTime desc').execute()["files"]
-        return response
+        page_token = None
+        while len(files) < 1000:
+            if parent_id != "root":
+                response = self.__service.files().list(supportsTeamDrives=True,
+                                                       includeTeamDriveItems=True,
+                                                       teamDriveId=parent_id,
+                                                       q=query,
+                                                       corpora='drive',
+                                                       spaces='drive',
+                                                       pageSize=200,
+                                                       pageToken=page_token,
+                                                       fields='nextPageToken, files(id, name, mimeType, size, teamDriveId, parents)',
+                                                       orderBy='folder, modifiedTime desc').execute()
+            else:
+                response = self.__service.files().list(q=query + " and 'me' in owners",
+                                                       pageSize=200,
+                                                       pageToken=page_token,
+                                                       spaces='drive',
+                                                       fields='nextPageToken, files(id, name, mimeType, size, parents)',
+                                                       orderBy='folder, modifiedTime desc').execute()
+            files.extend(response["files"])
+            page_token = response.get("nextPageToken")
+            if page_token is None or deadline is not None and time.time() > deadline:
+                break
+        return files
         
     
     def count(self, link):
@@ -1092,8 +2113,7 @@ class GoogleDriveHelper:
         msg = ""
         LOGGER.info(f"File ID: {file_id}")
         try:
-            drive_file = self.__service.files().get(fileId=file_id, fields="id, name, mimeType, size",
-                                                   supportsTeamDrives=True).execute()
+            drive_file = self.getFileMetadata(file_id)
             name = drive_file['name']
             LOGGER.info(f"Counting: {name}")
             if drive_file['mimeType'] == self.__G_DRIVE_DIR_MIME_TYPE:
@@ -0,0 +1,34 @@
+import threading
+
+from pyrogram import Client
+
+
+class LeechClient(Client):
+    """
+    Client whose save_file hands back the files a parallel leech uploaded
+    ahead of time, so the send_* call that follows only sends the message.
+    Files are sent in order that way while their uploads overlap.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.__preloaded_lock = threading.Lock()
+        # Key: local path, Value: the InputFile returned by its upload
+        self.__preloaded = {}
+
+    def preload(self, path, file):
+        with self.__preloaded_lock:
+            self.__preloaded[path] = file
+
+    def discard(self, path):
+        with self.__preloaded_lock:
+            self.__preloaded.pop(path, None)
+
+    def save_file(self, path, *args, **kwargs):
+        # A call with a file_id resumes an upload Telegram lost parts of
+        if isinstance(path, str) and kwargs.get("file_id") is None:
+            with self.__preloaded_lock:
+                file = self.__preloaded.pop(path, None)
+            if file is not None:
+                return file
+        return super().save_file(path, *args, **kwargs)
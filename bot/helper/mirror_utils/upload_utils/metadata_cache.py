@@ -0,0 +1,88 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class MetadataCache:
+    """
+    Size bounded LRU cache with a TTL for Drive file metadata and folder
+    listings, shared by every GoogleDriveHelper.
+
+    Entries are keyed by (kind, id) where kind is "meta" or "list". Helpers
+    invalidate what they change themselves; changes made by others show up
+    once the entry expires.
+    """
+
+    def __init__(self, max_entries=10000, ttl=300):
+        self.__max_entries = max_entries
+        self.__ttl = ttl
+        self.__lock = threading.Lock()
+        # Key: (kind, id), Value: (expiry time, value)
+        self.__entries = OrderedDict()
+        self.__hits = {}
+        self.__misses = {}
+
+    @property
+    def enabled(self):
+        return self.__max_entries > 0 and self.__ttl > 0
+
+    def get(self, kind, id):
+        """:return: the cached value or None"""
+        if not self.enabled:
+            return None
+        key = (kind, id)
+        with self.__lock:
+            entry = self.__entries.get(key)
+            if entry is not None and entry[0] < time.time():
+                del self.__entries[key]
+                entry = None
+            if entry is None:
+                self.__misses[kind] = self.__misses.get(kind, 0) + 1
+                return None
+            self.__entries.move_to_end(key)
+            self.__hits[kind] = self.__hits.get(kind, 0) + 1
+            return entry[1]
+
+    def put(self, kind, id, value):
+        if not self.enabled:
+            return
+        key = (kind, id)
+        with self.__lock:
+            self.__entries[key] = (time.time() + self.__ttl, value)
+            self.__entries.move_to_end(key)
+            while len(self.__entries) > self.__max_entries:
+                self.__entries.popitem(last=False)
+
+    def invalidate_listing(self, folder_id):
+        """Drops the listing of a folder a child was added to or removed from"""
+        with self.__lock:
+            self.__entries.pop(("list", folder_id), None)
+
+    def invalidate(self, id):
+        """Drops the metadata of id and every cached listing that contains it"""
+        self.invalidate_many([id])
+
+    def invalidate_many(self, ids):
+        """Same as invalidate for many ids, in one pass over the listings"""
+        ids = set(ids)
+        with self.__lock:
+            for id in ids:
+                self.__entries.pop(("meta", id), None)
+                self.__entries.pop(("list", id), None)
+            stale = [
+                key
+                for key, (_, value) in self.__entries.items()
+                if key[0] == "list" and any(file.get("id") in ids for file in value)
+            ]
+            for key in stale:
+                del self.__entries[key]
+
+    def stats(self):
+        """:return: {kind: (hits, misses, hit rate in percent)}"""
+        with self.__lock:
+            stats = {}
+            for kind in set(self.__hits) | set(self.__misses):
+                hits = self.__hits.get(kind, 0)
+                misses = self.__misses.get(kind, 0)
+                stats[kind] = (hits, misses, round(hits * 100 / (hits + misses), 1))
+            return stats
@@ -4,14 +4,18 @@
 
 import os
 import logging
+import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 from pyrogram.errors import FloodWait
 from hachoir.parser import createParser
 from hachoir.metadata import extractMetadata
 
-from bot import app, DOWNLOAD_DIR, AS_DOCUMENT, AS_DOC_USERS, AS_MEDIA_USERS
+from bot import app, DOWNLOAD_DIR, AS_DOCUMENT, AS_DOC_USERS, AS_MEDIA_USERS, LEECH_WORKERS
 from bot.helper.ext_utils.fs_utils import take_ss 
+from bot.helper.ext_utils.throughput import ThroughputMeter
 
 LOGGER = logging.getLogger(__name__)
 logging.getLogger("pyrogram").setLevel(logging.WARNING)
@@ -19,6 +23,9 @@ logging.getLogger("pyrogram").setLevel(logging.WARNING)
 VIDEO_SUFFIXES = ("MKV", "MP4", "MOV", "WMV", "3GP", "MPG", "WEBM", "AVI", "FLV", "M4V")
 AUDIO_SUFFIXES = ("MP3", "M4A", "M4B", "FLAC", "WAV", "AIF", "OGG", "AAC", "DTS", "MID", "AMR", "MKA")
 IMAGE_SUFFIXES = ("JPG", "JPX", "PNG", "GIF", "WEBP", "CR2", "TIF", "BMP", "JXR", "PSD", "ICO", "HEIC")
+# Files uploaded ahead of the one being sent, per worker. Telegram drops
+# uploaded parts that are not used for a while.
+LOOKAHEAD = 2
 
 
 class TgUploader:
@@ -29,8 +36,10 @@ class TgUploader:
         self.__app = app
         self.total_bytes = 0
         self.uploaded_bytes = 0
-        self.last_uploaded = 0
-        self.start_time = time.time()
+        # Key: path of a file being uploaded, Value: bytes of it reported
+        self.__progress = {}
+        self.__progress_lock = threading.Lock()
+        self.meter = ThroughputMeter()
         self.is_cancelled = False
         self.chat_id = listener.message.chat.id
         self.message_id = listener.uid
@@ -43,19 +52,99 @@ class TgUploader:
         msgs_dict = {}
         path = f"{DOWNLOAD_DIR}{self.message_id}"
         self.user_settings()
-        for dirpath, subdir, files in sorted(os.walk(path)):
-            for file in sorted(files):
-                if self.is_cancelled:
-                    return
-                up_path = os.path.join(dirpath, file)
-                self.upload_file(up_path, file, dirpath)
-                if self.is_cancelled:
-                    return
-                msgs_dict[file] = self.sent_msg.message_id
-                self.last_uploaded = 0
+        files = []
+        for dirpath, subdir, filenames in sorted(os.walk(path)):
+            for file in sorted(filenames):
+                files.append((os.path.join(dirpath, file), file, dirpath))
+        if LEECH_WORKERS > 1 and len(files) > 1:
+            sent = self.__upload_parallel(files, msgs_dict)
+        else:
+            sent = self.__upload_serial(files, msgs_dict)
+        if not sent:
+            return
         LOGGER.info(f"Leech Done: {self.name}")
         self.__listener.onUploadComplete(self.name, None, msgs_dict, None, None)
 
+    def __upload_serial(self, files, msgs_dict):
+        for up_path, file, dirpath in files:
+            if self.is_cancelled:
+                return False
+            self.upload_file(up_path, file, dirpath)
+            if self.is_cancelled:
+                return False
+            msgs_dict[file] = self.sent_msg.message_id
+        return True
+
+    def __upload_parallel(self, files, msgs_dict):
+        """
+        Uploads up to LEECH_WORKERS files at once while the messages are
+        sent one by one in the order of the walk, each replying to the
+        previous one as in the serial upload
+        """
+        pending = deque()
+        uploaded = []
+        queued = iter(files)
+        with ThreadPoolExecutor(max_workers=LEECH_WORKERS) as executor:
+            def submit():
+                item = next(queued, None)
+                if item is not None:
+                    pending.append((item[1], item[2], executor.submit(self.__preload, *item)))
+
+            try:
+                for _ in range(LEECH_WORKERS * LOOKAHEAD):
+                    submit()
+                while pending:
+                    file, dirpath, future = pending.popleft()
+                    submit()
+                    up_path = future.result()
+                    uploaded.append(up_path)
+                    if self.is_cancelled:
+                        return False
+                    # The walk name, for the same caption as a serial upload
+                    self.upload_file(up_path, file, dirpath)
+                    if self.is_cancelled:
+                        return False
+                    msgs_dict[file] = self.sent_msg.message_id
+                return True
+            finally:
+                # Uploads left behind by a cancel or an error are not sent
+                for _, _, future in pending:
+                    if not future.cancel():
+                        uploaded.append(future.result())
+                for up_path in uploaded:
+                    self.__app.discard(up_path)
+
+    def __preload(self, up_path, file, dirpath):
+        """
+        Uploads the content of a file for upload_file to send later
+        :return: path of the file, renamed as it will be sent
+        """
+        if self.is_cancelled:
+            return up_path
+        try:
+            up_path, file = self.__send_name(up_path, file, dirpath)
+            uploaded = self.__app.save_file(up_path, progress=self.upload_progress, progress_args=(up_path,))
+            if uploaded is not None and not self.is_cancelled:
+                self.__app.preload(up_path, uploaded)
+        except FloodWait as f:
+            # upload_file uploads it again itself
+            LOGGER.info(f)
+            time.sleep(f.x)
+        except Exception as e:
+            LOGGER.error(f"Upload ahead failed, sending {file} uploads it again: {e}")
+        return up_path
+
+    def __send_name(self, up_path, file, dirpath):
+        """Renames videos telegram does not stream to .mp4, as they are sent"""
+        if self.as_doc or not file.upper().endswith(VIDEO_SUFFIXES) or file.upper().endswith(("MKV", "MP4")):
+            return up_path, file
+        file = os.path.splitext(file)[0] + '.mp4'
+        new_path = os.path.join(dirpath, file)
+        # Renamed ahead already by a parallel upload
+        if new_path != up_path:
+            os.rename(up_path, new_path)
+        return new_path, file
+
     def upload_file(self, up_path, file, dirpath):
         cap_mono = f"<code>{file}</code>"
         notMedia = False
@@ -71,11 +160,7 @@ class TgUploader:
                         thumb = take_ss(up_path)
                     if self.is_cancelled:
                         return
-                    if not file.upper().endswith(("MKV", "MP4")):
-                        file = os.path.splitext(file)[0] + '.mp4'
-                        new_path = os.path.join(dirpath, file)
-                        os.rename(up_path, new_path)
-                        up_path = new_path
+                    up_path, file = self.__send_name(up_path, file, dirpath)
                     self.sent_msg = self.sent_msg.reply_video(video=up_path,
                                                               quote=True,
                                                               caption=cap_mono,
@@ -86,7 +171,8 @@ class TgUploader:
                                                               thumb=thumb,
                                                               supports_streaming=True,
                                                               disable_notification=True,
-                                                              progress=self.upload_progress)
+                                                              progress=self.upload_progress,
+                                                              progress_args=(up_path,))
                     if self.thumb is None and thumb is not None and os.path.lexists(thumb):
                         os.remove(thumb)
                 elif file.upper().endswith(AUDIO_SUFFIXES):
@@ -104,14 +190,16 @@ class TgUploader:
                                                               title=title,
                                                               thumb=thumb,
                                                               disable_notification=True,
-                                                              progress=self.upload_progress)
+                                                              progress=self.upload_progress,
+                                                              progress_args=(up_path,))
                 elif file.upper().endswith(IMAGE_SUFFIXES):
                     self.sent_msg = self.sent_msg.reply_photo(photo=up_path,
                                                               quote=True,
                                                               caption=cap_mono,
                                                               parse_mode="html",
                                                               disable_notification=True,
-                                                              progress=self.upload_progress)
+                                                              progress=self.upload_progress,
+                                                              progress_args=(up_path,))
                 else:
                     notMedia = True
             if self.as_doc or notMedia:
@@ -125,7 +213,8 @@ class TgUploader:
                                                              caption=cap_mono,
                                                              parse_mode="html",
                                                              disable_notification=True,
-                                                             progress=self.upload_progress)
+                                                             progress=self.upload_progress,
+                                                             progress_args=(up_path,))
                 if self.thumb is None and thumb is not None and os.path.lexists(thumb):
                     os.remove(thumb)
             if not self.is_cancelled:
@@ -133,13 +222,19 @@ class TgUploader:
         except FloodWait as f:
             LOGGER.info(f)
             time.sleep(f.x)
-    def upload_progress(self, current, total):
+    def upload_progress(self, current, total, up_path=None):
         if self.is_cancelled:
             self.__app.stop_transmission()
             return
-        chunk_size = current - self.last_uploaded
-        self.last_uploaded = current
-        self.uploaded_bytes += chunk_size
+        with self.__progress_lock:
+            # An upload sent again starts over from 0
+            chunk_size = current - min(self.__progress.get(up_path, 0), current)
+            if current >= total:
+                self.__progress.pop(up_path, None)
+            else:
+                self.__progress[up_path] = current
+            self.uploaded_bytes += chunk_size
+        self.meter.add(chunk_size)
 
     def user_settings(self):
         if self.user_id in AS_DOC_USERS:
@@ -150,10 +245,7 @@ class TgUploader:
             self.thumb = None
 
     def speed(self):
-        try:
-            return self.uploaded_bytes / (time.time() - self.start_time)
-        except ZeroDivisionError:
-            return 0
+        return self.meter.speed()
 
     def cancel_download(self):
         self.is_cancelled = True
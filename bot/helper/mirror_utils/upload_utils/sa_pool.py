@@ -0,0 +1,158 @@
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import deque
+
+LOGGER = logging.getLogger(__name__)
+
+# Drive lets one account upload or copy 750 GB per day
+DAILY_LIMIT = 750 * 1024 ** 3
+# Short pause after a single rate limit hit
+RATE_LIMIT_COOLDOWN = 60
+# This many rate limit hits inside the window mean the account is exhausted
+RATE_LIMIT_HITS = 3
+RATE_LIMIT_WINDOW = 600
+
+
+class ServiceAccountPool:
+    """
+    Thread-safe pool of the service accounts in the accounts folder.
+
+    Every account has its bytes uploaded/copied today, its recent rate limit
+    hits and the number of helpers currently using it. acquire() hands out
+    the least loaded account that is not cooling down.
+    """
+
+    def __init__(self, path="accounts", cooldown=86400):
+        self.__path = path
+        self.__cooldown = cooldown
+        self.__lock = threading.Lock()
+        self.__accounts = None
+        self.__day = None
+        self.__usage = {}
+        self.__leases = {}
+        self.__hits = {}
+        self.__cooling_until = {}
+
+    def __load(self):
+        # Caller holds the lock
+        if self.__accounts is not None:
+            return
+        accounts = []
+        for name in os.listdir(self.__path):
+            index, ext = os.path.splitext(name)
+            if ext == ".json" and index.isdigit():
+                accounts.append(int(index))
+        self.__accounts = sorted(accounts)
+        for index in self.__accounts:
+            self.__usage[index] = 0
+            self.__leases[index] = 0
+            self.__hits[index] = deque()
+            self.__cooling_until[index] = 0
+        LOGGER.info(f"Loaded {len(self.__accounts)} service accounts")
+
+    def __roll_day(self):
+        # Caller holds the lock
+        day = time.strftime("%Y-%m-%d", time.gmtime())
+        if day != self.__day:
+            self.__day = day
+            for index in self.__accounts:
+                self.__usage[index] = 0
+
+    def count(self):
+        with self.__lock:
+            self.__load()
+            return len(self.__accounts)
+
+    def acquire(self, exclude=(), healthy_only=True):
+        """
+        :return: index of the least loaded healthy account, None if all of
+            them are exhausted or cooling down. With healthy_only=False the
+            least loaded account is returned anyway.
+        """
+        with self.__lock:
+            self.__load()
+            self.__roll_day()
+            now = time.time()
+            healthy = [
+                index
+                for index in self.__accounts
+                if index not in exclude
+                and (
+                    not healthy_only
+                    or self.__cooling_until[index] <= now
+                    and self.__usage[index] < DAILY_LIMIT
+                )
+            ]
+            if not healthy:
+                return None
+            index = min(
+                healthy,
+                key=lambda i: (self.__leases[i], self.__usage[i], len(self.__hits[i]), i),
+            )
+            self.__leases[index] += 1
+            return index
+
+    def release(self, index):
+        with self.__lock:
+            if self.__leases.get(index, 0) > 0:
+                self.__leases[index] -= 1
+
+    def release_all(self, indexes):
+        for index in indexes:
+            self.release(index)
+
+    def add_usage(self, index, size):
+        with self.__lock:
+            self.__load()
+            self.__roll_day()
+            if index not in self.__usage:
+                return
+            self.__usage[index] += size
+            if self.__usage[index] >= DAILY_LIMIT:
+                LOGGER.info(f"Service account {index}.json reached the daily limit")
+                self.__cooling_until[index] = time.time() + self.__cooldown
+
+    def report_error(self, index, reason):
+        with self.__lock:
+            self.__load()
+            if index not in self.__hits:
+                return
+            now = time.time()
+            hits = self.__hits[index]
+            hits.append(now)
+            while hits and hits[0] < now - RATE_LIMIT_WINDOW:
+                hits.popleft()
+            if reason == "dailyLimitExceeded" or len(hits) >= RATE_LIMIT_HITS:
+                cooldown = self.__cooldown
+            else:
+                cooldown = RATE_LIMIT_COOLDOWN
+            self.__cooling_until[index] = max(self.__cooling_until[index], now + cooldown)
+            LOGGER.info(f"Service account {index}.json got {reason}, cooling down for {cooldown}s")
+
+    def stats(self):
+        with self.__lock:
+            self.__load()
+            self.__roll_day()
+            now = time.time()
+            return {
+                index: {
+                    "usage": self.__usage[index],
+                    "leases": self.__leases[index],
+                    "recent_hits": len(self.__hits[index]),
+                    "cooling": max(self.__cooling_until[index] - now, 0),
+                }
+                for index in self.__accounts
+            }
+
+    def lease_tracker(self, owner):
+        """
+        :return: a list that collects the accounts acquired for owner. The
+            owner releases them when its task ends, anything still in the
+            list is released once owner is garbage collected.
+        """
+        leases = []
+        weakref.finalize(owner, self.release_all, leases)
+        return leases
@@ -0,0 +1,134 @@
+import logging
+import queue
+import threading
+import time
+
+from googleapiclient.http import MediaUpload
+
+LOGGER = logging.getLogger(__name__)
+
+# Bytes asked from the source per read
+READ_SIZE = 1024 * 1024
+# Times a dropped source is asked again for the rest, in a row
+RESUME_RETRIES = 5
+_EOF = object()
+
+
+class StreamMediaUpload(MediaUpload):
+    """
+    Resumable media fed from a streamed HTTP response while it downloads.
+
+    A reader thread pulls the response into a queue of at most buffer_size
+    bytes. Bytes leave memory once Drive has confirmed them, so a chunk can
+    be sent again after a timeout, and nothing touches the disk. With
+    reopen, a source that drops is asked for the rest with a Range request.
+    """
+
+    def __init__(
+        self, response, mimetype, size=None, chunksize=READ_SIZE, buffer_size=64 * READ_SIZE, reopen=None
+    ):
+        super().__init__()
+        self.__response = response
+        self.__reopen = reopen
+        self.__expected = size
+        self._mimetype = mimetype
+        self._size = size
+        self._chunksize = chunksize
+        self.__queue = queue.Queue(maxsize=max(buffer_size // READ_SIZE, 1))
+        # Bytes from offset __base on that Drive has not confirmed yet
+        self.__buffer = bytearray()
+        self.__base = 0
+        self.__eof = False
+        self.__closed = False
+        self.received = 0
+        threading.Thread(target=self.__read, daemon=True).start()
+
+    def __read(self):
+        offset = 0
+        retries = 0
+        try:
+            while True:
+                try:
+                    for data in self.__response.iter_content(READ_SIZE):
+                        if self.__closed:
+                            return
+                        if data:
+                            self.__put(data)
+                            offset += len(data)
+                            retries = 0
+                    if self.__expected is not None and offset < self.__expected:
+                        raise IOError(f"Source ended at {offset} of {self.__expected} bytes")
+                    break
+                except Exception as e:
+                    if self.__reopen is None or self.__closed or retries >= RESUME_RETRIES:
+                        raise e
+                    retries += 1
+                    LOGGER.info(f"Source dropped at {offset} bytes, resuming: {e}")
+                    self.__response.close()
+                    time.sleep(retries)
+                    response = self.__reopen(offset)
+                    if response is None:
+                        raise e
+                    self.__response = response
+            self.__put(_EOF)
+        except Exception as e:
+            self.__put(e)
+        finally:
+            self.__response.close()
+
+    def __put(self, item):
+        # Gives up once closed, nobody takes from the queue then
+        while not self.__closed:
+            try:
+                self.__queue.put(item, timeout=1)
+                return
+            except queue.Full:
+                continue
+
+    def chunksize(self):
+        return self._chunksize
+
+    def mimetype(self):
+        return self._mimetype
+
+    def size(self):
+        return self._size
+
+    def resumable(self):
+        return True
+
+    def has_stream(self):
+        return False
+
+    def fill(self, end):
+        """
+        Waits until the bytes up to offset end are buffered or the source
+        ended. The size becomes known at the end, so the chunk that reaches
+        it is sent as the last one.
+        """
+        while not self.__eof and self.__base + len(self.__buffer) < end:
+            data = self.__queue.get()
+            if data is _EOF:
+                self.__eof = True
+                self._size = self.received
+            elif isinstance(data, Exception):
+                raise data
+            else:
+                self.__buffer += data
+                self.received += len(data)
+
+    def getbytes(self, begin, length):
+        if begin < self.__base:
+            raise ValueError(f"Offset {begin} of the stream is no longer buffered")
+        # Everything before begin is on Drive already
+        del self.__buffer[: begin - self.__base]
+        self.__base = begin
+        self.fill(begin + length)
+        return bytes(self.__buffer[:length])
+
+    def close(self):
+        self.__closed = True
+        self.__response.close()
+
+    def to_json(self):
+        raise NotImplementedError("A streamed upload can not be serialized")
@@ -0,0 +1,110 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+
+LOGGER = logging.getLogger(__name__)
+
+# Drive keeps an unfinished resumable session for about a week
+SESSION_LIFETIME = 6 * 24 * 3600
+# Bytes read from the start, middle and end of a file to fingerprint it
+SAMPLE_SIZE = 1024 * 1024
+
+
+class UploadJournal:
+    """
+    Small on-disk journal of the resumable upload sessions in flight.
+
+    An entry is matched by destination folder, file name, size and a content
+    fingerprint, not by the local path, so an upload of the same file
+    downloaded again after a restart resumes the old session. A key is
+    claimed by one running upload at a time.
+    """
+
+    def __init__(self, path="upload_journal.json"):
+        self.__path = path
+        self.__lock = threading.Lock()
+        self.__entries = None
+        # Keys of the uploads running in this process
+        self.__active = set()
+
+    def __load(self):
+        # Caller holds the lock
+        if self.__entries is not None:
+            return
+        try:
+            with open(self.__path, "r") as f:
+                entries = json.load(f)
+        except FileNotFoundError:
+            entries = {}
+        except ValueError:
+            LOGGER.error(f"Discarding corrupt upload journal: {self.__path}")
+            entries = {}
+        now = time.time()
+        self.__entries = {
+            key: entry
+            for key, entry in entries.items()
+            if now - entry["created"] < SESSION_LIFETIME
+        }
+        if len(self.__entries) != len(entries):
+            self.__save()
+
+    def __save(self):
+        # Caller holds the lock
+        tmp_path = f"{self.__path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.__entries, f)
+        os.replace(tmp_path, self.__path)
+
+    @staticmethod
+    def key(file_path, file_name, parent_id):
+        size = os.path.getsize(file_path)
+        digest = hashlib.sha1(f"{parent_id}/{file_name}/{size}".encode())
+        with open(file_path, "rb") as f:
+            for offset in (0, size // 2, max(size - SAMPLE_SIZE, 0)):
+                f.seek(offset)
+                digest.update(f.read(SAMPLE_SIZE))
+        return digest.hexdigest()
+
+    def claim(self, key):
+        """:return: False if another running upload holds the key"""
+        with self.__lock:
+            if key in self.__active:
+                return False
+            self.__active.add(key)
+            return True
+
+    def release(self, key):
+        with self.__lock:
+            self.__active.discard(key)
+
+    def get(self, key):
+        with self.__lock:
+            self.__load()
+            return self.__entries.get(key)
+
+    def add(self, key, uri, file_path, parent_id):
+        stat = os.stat(file_path)
+        with self.__lock:
+            self.__load()
+            entry = self.__entries[key] = {
+                "uri": uri,
+                "path": file_path,
+                "size": stat.st_size,
+                "mtime": stat.st_mtime,
+                "parent_id": parent_id,
+                "created": time.time(),
+            }
+            self.__save()
+            return entry
+
+    def remove(self, key):
+        if key is None:
+            return
+        with self.__lock:
+            self.__load()
+            if self.__entries.pop(key, None) is not None:
+                self.__save()
+
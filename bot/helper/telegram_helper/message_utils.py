@@ -107,17 +107,10 @@ def update_all_messages():
         dlspeed_bytes = 0
         uldl_bytes = 0
         for download in list(download_dict.values()):
-            speedy = download.speed()
             if download.status() == MirrorStatus.STATUS_DOWNLOADING:
-                if "KiB/s" in speedy:
-                    dlspeed_bytes += float(speedy.split("K")[0]) * 1024
-                elif "MiB/s" in speedy:
-                    dlspeed_bytes += float(speedy.split("M")[0]) * 1048576
+                dlspeed_bytes += download.speed_raw()
             if download.status() == MirrorStatus.STATUS_UPLOADING:
-                if "KB/s" in speedy:
-                    uldl_bytes += float(speedy.split("K")[0]) * 1024
-                elif "MB/s" in speedy:
-                    uldl_bytes += float(speedy.split("M")[0]) * 1048576
+                uldl_bytes += download.speed_raw()
         dlspeed = get_readable_file_size(dlspeed_bytes)
         ulspeed = get_readable_file_size(uldl_bytes)
         msg += f"\n<b>DL:</b>{dlspeed}ps | <b>UL:</b>{ulspeed}/s \n"
@@ -144,17 +137,10 @@ def sendStatusMessage(msg, bot):
         dlspeed_bytes = 0
         uldl_bytes = 0
         for download in list(download_dict.values()):
-            speedy = download.speed()
             if download.status() == MirrorStatus.STATUS_DOWNLOADING:
-                if "KiB/s" in speedy:
-                    dlspeed_bytes += float(speedy.split("K")[0]) * 1024
-                elif "MiB/s" in speedy:
-                    dlspeed_bytes += float(speedy.split("M")[0]) * 1048576
+                dlspeed_bytes += download.speed_raw()
             if download.status() == MirrorStatus.STATUS_UPLOADING:
-                if "KB/s" in speedy:
-                    uldl_bytes += float(speedy.split("K")[0]) * 1024
-                elif "MB/s" in speedy:
-                    uldl_bytes += float(speedy.split("M")[0]) * 1048576
+                uldl_bytes += download.speed_raw()
         dlspeed = get_readable_file_size(dlspeed_bytes)
         ulspeed = get_readable_file_size(uldl_bytes)
         progress += f"\n<b>DL:</b>{dlspeed}ps | <b>UL:</b>{ulspeed}/s \n"
@@ -20,13 +20,21 @@ def cloneNode(update, context):
         if res != "":
             sendMessage(res, context.bot, update)
             return
-        if STOP_DUPLICATE_CLONE:
+        if STOP_DUPLICATE_CLONE and not gd.clone_resumable(link):
             LOGGER.info('Checking File/Folder if already in Drive...')
-            smsg, button = gd.drive_list(name)
-            if smsg:
-                msg3 = "File/Folder is already available in Drive.\nHere are the search results:"
-                sendMarkup(msg3, context.bot, update, button)
-                return
+            duplicates = gd.find_duplicates(link)
+            if duplicates is not None and duplicates[0] > 0:
+                # The content index knows every file, no name search needed
+                total, found = duplicates
+                if found == total:
+                    sendMessage(f"File/Folder is already available in Drive.\nAll {total} file(s) have identical copies there.", context.bot, update)
+                    return
+            else:
+                smsg, button = gd.drive_list(name)
+                if smsg:
+                    msg3 = "File/Folder is already available in Drive.\nHere are the search results:"
+                    sendMarkup(msg3, context.bot, update, button)
+                    return
         if CLONE_LIMIT is not None:
             result = check_limit(size, CLONE_LIMIT)
             if result:
@@ -46,7 +54,7 @@ def cloneNode(update, context):
             if len(Interval) == 0:
                 Interval.append(setInterval(DOWNLOAD_STATUS_UPDATE_INTERVAL, update_all_messages))
             sendStatusMessage(update, context.bot)
-            result, button = drive.clone(link)
+            result, button = drive.clone(link, gd.manifest)
             with download_dict_lock:
                 del download_dict[update.message.message_id]
                 count = len(download_dict)
@@ -1,3 +1,4 @@
+import html
 import threading
 
 from telegram.ext import CommandHandler
@@ -9,18 +10,54 @@ from bot.helper.telegram_helper.filters import CustomFilters
 from bot.helper.telegram_helper.message_utils import auto_delete_message, sendMessage
 
 
+# Failed links listed in the reply of a bulk delete
+MAX_REPORTED = 20
+
+
+def delete_links(drive, links):
+    """Deletes every link in one bulk delete and reports the ones left"""
+    ids = {}
+    failed = {}
+    for link in links:
+        try:
+            ids[link] = drive.getIdFromUrl(link)
+        except (KeyError, IndexError):
+            failed[link] = "Google drive ID could not be found in the link"
+    errors = drive.delete_files(list(ids.values()))
+    for link, file_id in ids.items():
+        if file_id in errors:
+            failed[link] = errors[file_id]
+    for file_id in ids.values():
+        errors.pop(file_id, None)
+    msg = f"Deleted {len(links) - len(failed)} of {len(links)} links"
+    if errors:
+        # Items inside a folder that could only be emptied in part
+        msg += f", {len(errors)} items inside them were left"
+    for link, reason in list(failed.items())[:MAX_REPORTED]:
+        msg += f"\n<code>{html.escape(link)}</code>: {html.escape(reason)}"
+    if len(failed) > MAX_REPORTED:
+        msg += f"\nand {len(failed) - MAX_REPORTED} more, check log"
+    for link, reason in failed.items():
+        LOGGER.error(f"Could not delete {link}: {reason}")
+    return msg
+
+
 def deletefile(update, context):
     msg_args = update.message.text.split(None, 1)
     msg = ""
     try:
-        link = msg_args[1]
-        LOGGER.info(link)
+        # One link per line or separated by spaces
+        links = list(dict.fromkeys(msg_args[1].split()))
+        LOGGER.info(links)
     except IndexError:
         msg = "send a link along with command"
 
     if msg == "":
         drive = gdriveTools.GoogleDriveHelper()
-        msg = drive.deletefile(link)
+        if len(links) == 1:
+            msg = drive.deletefile(links[0])
+        else:
+            msg = delete_links(drive, links)
     LOGGER.info(f"this is msg : {msg}")
     reply_message = sendMessage(msg, context.bot, update)
 
@@ -27,6 +27,7 @@ from bot import (
     MEGA_KEY,
     SHORTENER,
     SHORTENER_API,
+    STREAM_MIRROR,
     Interval,
     dispatcher,
     download_dict,
@@ -37,6 +38,8 @@ from bot import (
 )
 from bot.helper.ext_utils import bot_utils, fs_utils
 from bot.helper.ext_utils.bot_utils import setInterval
+from bot.helper.ext_utils.http_transport import session
+from bot.helper.ext_utils.shortener import shortener
 from bot.helper.ext_utils.exceptions import (
     DirectDownloadLinkException,
     NotSupportedExtractionArchive,
@@ -46,6 +49,7 @@ from bot.helper.mirror_utils.download_utils.direct_link_generator import (
     direct_link_generator,
 )
 from bot.helper.mirror_utils.download_utils.mega_download import MegaDownloader
+from bot.helper.mirror_utils.download_utils.stream_download import StreamMirrorHelper
 from bot.helper.mirror_utils.download_utils.telegram_downloader import (
     TelegramDownloadHelper,
 )
@@ -254,9 +258,7 @@ class MirrorListener(listeners.MirrorListeners):
             msg = f"<b>Filename : </b><code>{download_dict[self.uid].name()}</code>\n<b>Size : </b><code>{size}</code>"
             buttons = button_build.ButtonMaker()
             if SHORTENER is not None and SHORTENER_API is not None:
-                surl = requests.get(
-                    f"https://{SHORTENER}/api?api={SHORTENER_API}&url={link}&format=text"
-                ).text
+                surl = shortener.short_url(link)
                 buttons.buildbutton("☁️ Drive Link", surl)
             else:
                 buttons.buildbutton("☁️ Drive Link", link)
@@ -267,15 +269,16 @@ class MirrorListener(listeners.MirrorListeners):
                 if os.path.isdir(f'{DOWNLOAD_DIR}/{self.uid}/{download_dict[self.uid].name()}'):
                     share_url += '/'
                     if SHORTENER is not None and SHORTENER_API is not None:
-                        siurl = requests.get(f'https://{SHORTENER}/api?api={SHORTENER_API}&url={share_url}&format=text').text
+                        siurl = shortener.short_url(share_url)
                         buttons.buildbutton("⚡ Index Link", siurl)
                     else:
                         buttons.buildbutton("⚡ Index Link", share_url)
                 else:
                     share_urls = f'{INDEX_URL}/{url_path}?a=view'
                     if SHORTENER is not None and SHORTENER_API is not None:
-                        siurl = requests.get(f'https://{SHORTENER}/api?api={SHORTENER_API}&url={share_url}&format=text').text
-                        siurls = requests.get(f'https://{SHORTENER}/api?api={SHORTENER_API}&url={share_urls}&format=text').text
+                        short_urls = shortener.short_urls([share_url, share_urls])
+                        siurl = short_urls[share_url]
+                        siurls = short_urls[share_urls]
                         buttons.buildbutton("⚡ Index Link", siurl)
                         if VIEW_LINK:
                             buttons.buildbutton("🌐 View Link", siurls)
@@ -405,7 +408,7 @@ def _mirror(bot, update,isTar=False, isZip=False, extract=False, isLeech=False):
                 link = reply_text
 
             if not bot_utils.is_url(link) and not bot_utils.is_magnet(link) and not os.path.exists(link) :
-                resp = requests.get(link)
+                resp = session.get(link)
                 if resp.status_code == 200:
                     file_name = str(time.time()).replace(".", "") + ".torrent"
                     open(file_name, "wb").write(resp.content)
@@ -433,7 +436,8 @@ def _mirror(bot, update,isTar=False, isZip=False, extract=False, isLeech=False):
                 f"Use /{BotCommands.CloneCommand} To Copy File/Folder", bot, update
             )
             return
-        res, size, name, files = gdriveTools.GoogleDriveHelper().clonehelper(link)
+        gd = gdriveTools.GoogleDriveHelper()
+        res, size, name, files = gd.clonehelper(link)
         if res != "":
             sendMessage(res, bot, update)
             return
@@ -450,7 +454,7 @@ def _mirror(bot, update,isTar=False, isZip=False, extract=False, isLeech=False):
                 setInterval(DOWNLOAD_STATUS_UPDATE_INTERVAL, update_all_messages)
             )
         sendStatusMessage(update, bot)
-        drive.download(link)
+        drive.download(link, gd.manifest)
 
     elif bot_utils.is_mega_link(link) and MEGA_KEY is not None and not BLOCK_MEGA_LINKS:
         mega_dl = MegaDownloader(listener)
@@ -460,6 +464,19 @@ def _mirror(bot, update,isTar=False, isZip=False, extract=False, isLeech=False):
         sendMessage(
             "Mega links are blocked. Dont try to mirror mega links.", bot, update
         )
+    elif (
+        STREAM_MIRROR
+        and not isTar
+        and not isZip
+        and not extract
+        and not isLeech
+        and StreamMirrorHelper(listener).add_download(
+            link,
+            name,
+            lambda: ariaDlManager.add_download(link, f"{DOWNLOAD_DIR}{listener.uid}/", listener, name),
+        )
+    ):
+        sendStatusMessage(update, bot)
     else:
         ariaDlManager.add_download(
             link, f"{DOWNLOAD_DIR}{listener.uid}/", listener, name